@@ -51,6 +51,8 @@
         'wizard/enroll_wizard.xml',
         'wizard/assignment_wizard.xml',
         'wizard/timetable_wizard.xml',
+        'wizard/timetable_generator.xml',
+        'wizard/timetable_reschedule.xml',
         'wizard/evaluation_wizard.xml',
         'wizard/res_config_settings.xml',
         'wizard/attendance_wizard.xml',
@@ -58,6 +60,7 @@
         'wizard/portal_wizard.xml',
         'wizard/fee_slip_wizard.xml',
         'wizard/student_route_wizard.xml',
+        'wizard/route_optimizer_wizard.xml',
 
         'views/student_attendance_view.xml',
         'views/student_enrollment.xml',
@@ -78,6 +81,9 @@
         'views/notice_board_view.xml',
         'views/student_assignment_view.xml',
         'views/fee_summary.xml',
+        'report/fee_aging_report.xml',
+        'report/teaching_load_report.xml',
+        'report/transport_usage_report.xml',
         'views/student_subject.xml',
         'views/grade_scale.xml',
         'views/grade_subject.xml',
@@ -99,6 +105,7 @@
         'views/attendance_kiosk.xml',
         'views/transport_route.xml',
         'views/transport_trip.xml',
+        'views/transport_scanner.xml',
         'views/transport_location.xml',
         'views/menu_item.xml',
         'views/website_application_form.xml',
@@ -124,6 +131,7 @@
             "wk_school_management/static/src/js/student_portal.js",
             "wk_school_management/static/src/js/student_attendance.js",
             "wk_school_management/static/src/js/payment_form.js",
+            "wk_school_management/static/src/js/transport_scanner.js",
 
             "/web/static/lib/fullcalendar/core/index.global.js",
             "/web/static/lib/fullcalendar/core/locales-all.global.js",
@@ -7,12 +7,16 @@
 #
 #################################################################################
 import base64
+import hashlib
 
 import logging
+import pytz
 from odoo import http
 from odoo.http import request, Controller
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, time, timedelta
 from odoo import fields, _
+from odoo.tools import consteq
+from werkzeug.exceptions import NotFound
 from odoo.addons.mail.controllers.mail import MailController
 
 _logger = logging.getLogger(__name__)
@@ -368,7 +372,6 @@ class WebsiteMenuApplication(http.Controller):
 
     @http.route('/school_management/scheduled_classes', type='json', website=True, auth="user")
     def scheduled_classes_data(self, **kw):
-        values = {}
         state = kw.get('sort_by')
         selected_date = kw.get('sort_date')
         current_date = datetime.today().date()
@@ -395,84 +398,81 @@ class WebsiteMenuApplication(http.Controller):
         if state != 'all':
             domain.append(('state', '=', state))
 
-        classes = request.env['wk.class.timetable'].search(domain, order='class_date asc')
-
-        future_classes = classes.filtered(lambda c: c.class_date >= current_date)
-        past_classes = classes.filtered(lambda c: c.class_date < current_date)
-
-        past_classes = past_classes.sorted(key=lambda c: c.class_date) 
-        ordered_classes = future_classes + past_classes
-
-        values['timetable_ids'] = ordered_classes
-        body = request.env['ir.qweb']._render('wk_school_management.scheduled_classes', values)
-        return body
+        return request.env['wk.class.timetable'].get_dashboard_classes(
+            domain, limit=min(int(kw.get('limit') or 20), 100), offset=int(kw.get('offset') or 0))
+
+    @http.route('/school_management/teaching_load', type='json', website=True, auth="user")
+    def teaching_load_data(self, group_by='teacher_id', date_from=None, date_to=None, **kw):
+        company_id = [int(company) for company in (kw.get('company_id') or '').split('-') if company]
+        return request.env['wk.teaching.load.report'].get_workload_data(
+            group_by=group_by, date_from=date_from, date_to=date_to, company_ids=company_id)
+
+    def _get_dashboard_period(self, sort_date):
+        """Return the UTC bounds [start, end) of the period in the user timezone, and the timezone."""
+        tz = pytz.timezone(request.env.user.tz or 'UTC')
+        today = datetime.now(tz).date()
+        start_date = end_date = today
+        if sort_date == 'week':
+            start_date = today - timedelta(days=today.weekday())
+            end_date = start_date + timedelta(days=6)
+        elif sort_date == 'month':
+            start_date = today.replace(day=1)
+            end_date = (start_date + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        elif sort_date == 'year':
+            start_date = today.replace(month=1, day=1)
+            end_date = today.replace(month=12, day=31)
+
+        def to_utc(day):
+            return tz.localize(datetime.combine(day, time.min)).astimezone(pytz.utc).replace(tzinfo=None)
+        return to_utc(start_date), to_utc(end_date + timedelta(days=1)), tz.zone
+
+    def _get_state_chart_data(self, model, states, **kw):
+        """Count the records created in the period per state, and per state and bucket of time.
+
+        A single grouped query serves both the doughnut (``counts``, in the
+        order of ``states``) and the trend (``labels`` and one ``series`` per
+        state), the buckets being days, weeks or months in the user timezone.
+        """
+        sort_date = kw.get('sort_date')
+        interval = kw.get('interval') or {'year': 'month', 'month': 'day', 'week': 'day'}.get(sort_date)
+        if interval not in ('day', 'week', 'month'):
+            interval = None
+        company_ids = [int(cid) for cid in (kw.get('company_id') or '').split('-') if cid]
+        start, end, tz = self._get_dashboard_period(sort_date)
+        domain = [
+            ('create_date', '>=', start),
+            ('create_date', '<', end),
+            ('company_id', 'in', company_ids),
+        ]
+        groupby = ['state'] + ([f'create_date:{interval}'] if interval else [])
+        groups = request.env[model].sudo().with_context(tz=tz)._read_group(domain, groupby, ['__count'])
+
+        counts = dict.fromkeys(states, 0)
+        buckets = {}
+        for state, *bucket, count in groups:
+            if state not in counts:
+                continue
+            counts[state] += count
+            if bucket:
+                label = fields.Date.to_string(bucket[0])
+                buckets.setdefault(label, dict.fromkeys(states, 0))[state] += count
+        labels = sorted(buckets)
+        return {
+            'counts': [counts[state] for state in states],
+            'labels': labels,
+            'series': {state: [buckets[label][state] for label in labels] for state in states},
+            'interval': interval,
+        }
 
     @http.route(['/school_dashboard/enrollment_data'], type='json', auth='user', website=True)
     def enrollment_graph(self, **kw):
-        values = []
-        selected_date = kw.get('sort_date')
-        company_id = [int(cid) for cid in kw.get('company_id', '').split('-') if cid]
-
-        current_date = datetime.today()
-        start_date = end_date = current_date
-
-        if selected_date == 'week':
-            start_date = current_date - timedelta(days=current_date.weekday())
-            end_date = start_date + timedelta(days=6)
-        elif selected_date == 'month':
-            start_date = current_date.replace(day=1)
-            next_month = (start_date + timedelta(days=32)).replace(day=1)
-            end_date = next_month - timedelta(days=1)
-        elif selected_date == 'year':
-            start_date = current_date.replace(month=1, day=1)
-            end_date = current_date.replace(month=12, day=31)
-
-        start_str = start_date.strftime('%Y-%m-%d 00:00:00')
-        end_str = end_date.strftime('%Y-%m-%d 23:59:59')
-
-        states = ['draft', 'progress', 'complete', 'cancel']
-        for state in states:
-            count = request.env['student.enrollment'].sudo().search_count([
-                ('state', '=', state),
-                ('create_date', '>=', start_str),
-                ('create_date', '<=', end_str),
-                ('company_id', 'in', company_id)])
-            values.append(count)
-        return values
+        return self._get_state_chart_data(
+            'student.enrollment', ['draft', 'progress', 'complete', 'cancel'], **kw)
 
     @http.route(['/school_dashboard/application_data'], type='json', auth='user', website=True)
     def application_graph(self, **kw):
-        values = []
-        selected_date = kw.get('sort_date')
-        company_id = [int(cid) for cid in kw.get('company_id', '').split('-') if cid]
-
-        current_date = datetime.today()
-        start_date = end_date = current_date
-
-        if selected_date == 'week':
-            start_date = current_date - timedelta(days=current_date.weekday())
-            end_date = start_date + timedelta(days=6)
-        elif selected_date == 'month':
-            start_date = current_date.replace(day=1)
-            next_month = (start_date + timedelta(days=32)).replace(day=1)
-            end_date = next_month - timedelta(days=1)
-        elif selected_date == 'year':
-            start_date = current_date.replace(month=1, day=1)
-            end_date = current_date.replace(month=12, day=31)
-
-        start_str = start_date.strftime('%Y-%m-%d 00:00:00')
-        end_str = end_date.strftime('%Y-%m-%d 23:59:59')
-
-        states = ['new', 'confirm', 'enroll', 'cancel']
-        for state in states:
-            count = request.env['wk.application.form'].sudo().search_count([
-                ('state', '=', state),
-                ('create_date', '>=', start_str),
-                ('create_date', '<=', end_str),
-                ('company_id', 'in', company_id)
-            ])
-            values.append(count)
-        return values
+        return self._get_state_chart_data(
+            'wk.application.form', ['new', 'confirm', 'enroll', 'cancel'], **kw)
 
 
 class CustomerPortal(Controller):
@@ -544,12 +544,10 @@ class CustomerPortal(Controller):
 
         timetable_ids = request.env['wk.class.timetable'].sudo().search([
             ('grade_id', '=', grade.id),
+            ('student_index_ids', 'in', student.ids),
+            ('state', '!=', 'cancel'),
             ('class_date', '=', date.today())
         ])
-        if timetable_ids and hasattr(timetable_ids[0], 'student_ids'):
-            timetable_ids = timetable_ids.filtered(
-                lambda t: student.id in t.student_ids.mapped('student_id').ids
-            )
 
         fee_slips = request.env['wk.fee.slip'].sudo().search([
             ('student_id', '=', student.id),
@@ -625,31 +623,29 @@ class CustomerPortal(Controller):
 
         timetable_domain = [
             ('grade_id', '=', selected_student.current_grade_id.id),
+            ('student_index_ids', 'in', selected_student.ids),
+            ('state', '!=', 'cancel'),
             ('class_date', '>=', date.today())
         ]
-        all_timetables = request.env['wk.class.timetable'].sudo().search(timetable_domain, order='class_date')
-
-        if all_timetables and hasattr(all_timetables[0], 'student_ids'):
-            all_timetables = all_timetables.filtered(
-                lambda t: selected_student.id in t.student_ids.mapped('student_id').ids
-            )
+        Timetable = request.env['wk.class.timetable'].sudo()
 
         pager = request.website.pager(
             url="/my/timetables",
-            total=len(all_timetables),
+            total=Timetable.search_count(timetable_domain),
             page=page,
             step=10,
             url_args={'student_id': selected_student.id, 'view_mode': kw.get('view_mode', '')}
         )
 
-        paginated_timetables = all_timetables[pager['offset']: pager['offset'] + 10]
-        values['time_table_ids'] = paginated_timetables
+        values['time_table_ids'] = Timetable.search(
+            timetable_domain, order='class_date', limit=10, offset=pager['offset'])
 
         view_mode = kw.get('view_mode')
         if view_mode == "list":
             values['pager'] = pager
             return request.render("wk_school_management.portal_timetable_list_view", values)
 
+        values['calendar_url'] = selected_student.sudo()._get_calendar_url()
         return request.render("wk_school_management.portal_timetable", values)
 
     @http.route(['/my/assignments', '/my/assignments/page/<int:page>'], type='http', auth="user", website=True)
@@ -1202,50 +1198,62 @@ class CustomerPortal(Controller):
             values['student_discipline_id'] = discipline_record
         return request.render("wk_school_management.portal_discipline_form_view", values)
 
+    def _get_feed_window(self, start=None, end=None, max_days=42):
+        """Return the (start, end) dates of a calendar feed, the current week by default."""
+        try:
+            start_date = fields.Date.to_date(start[:10]) if start else None
+            end_date = fields.Date.to_date(end[:10]) if end else None
+        except ValueError:
+            start_date = end_date = None
+        if not start_date:
+            start_date = date.today() - timedelta(days=date.today().weekday())
+        if not end_date or end_date < start_date:
+            end_date = start_date + timedelta(days=6)
+        return start_date, min(end_date, start_date + timedelta(days=max_days))
+
     @http.route(['/my/timesheet', '/my/timesheet/page/<int:page>'], type='json', auth="user", website=True, csrf=False)
-    def portal_my_timesheet(self, page=1, **kw):
+    def portal_my_timesheet(self, page=1, start=None, end=None, limit=200, **kw):
         context = self._get_student_context()
         selected_student = context['selected_student']
         if not selected_student:
-            return request.render('wk_school_management.student_not_found')
-        time_table_details = request.env['wk.class.timetable'].sudo().search(
-            [('grade_id', '=', selected_student.current_grade_id.id)], order='class_date'
-        )
-        time_table_details = time_table_details.filtered(
-            lambda m: selected_student.id in m.student_ids.mapped('student_id').ids
-        )
-        Scheduled_time_table = []
-        if time_table_details:
-            for time_table in time_table_details:
-                color = ''
-                if time_table.state == "draft":
-                    color = '#bbcffb'
-                elif time_table.state == "running":
-                    color = '#bbcffb'
-                elif time_table.state == "complete":
-                    color = '#bbcffb'
-                timetable_cal_dict = {}
-                start_time = time_table.get_slot_time(
-                    time_table.timeslot_id.start_time, calendar_time=True)
-                end_time = time_table.get_slot_time(
-                    time_table.timeslot_id.end_time, calendar_time=True)
-                app_cal_start = f"{time_table.class_date.strftime('%Y-%m-%d')}T{start_time}"
-                app_cal_end = f"{time_table.class_date.strftime('%Y-%m-%d')}T{end_time}"
-                class_title = f"{time_table.subject_id.name}-({time_table.location_id.name})"
-                timetable_cal_dict['title'] = class_title
-                timetable_cal_dict['start'] = app_cal_start
-                timetable_cal_dict['end'] = app_cal_end
-                timetable_cal_dict['color'] = color
-                timetable_cal_dict['id'] = time_table.id
-                timetable_cal_dict['extendedProps'] = {
-                    'date': time_table.class_date,
-                    'start_time': time_table.timeslot_id.float_to_time(time_table.timeslot_id.start_time),
-                    'end_time': time_table.timeslot_id.float_to_time(time_table.timeslot_id.end_time),
-                    'location': time_table.location_id.name,
-                },
-                Scheduled_time_table.append(timetable_cal_dict)
-
-        return {'data': Scheduled_time_table}
+            return {'data': []}
+        start_date, end_date = self._get_feed_window(start, end)
+        limit = min(int(limit), 200)
+        events = request.env['wk.class.timetable'].sudo().get_student_feed(
+            selected_student, start_date, end_date, limit=limit, offset=(max(int(page), 1) - 1) * limit)
+        return {'data': events}
+
+    @http.route(['/my/timetable/feed'], type='http', auth="user", website=True, methods=['GET'])
+    def portal_timetable_feed(self, start=None, end=None, **kw):
+        context = self._get_student_context()
+        selected_student = context['selected_student']
+        if not selected_student:
+            return request.make_json_response([])
+        start_date, end_date = self._get_feed_window(start, end)
+        Timetable = request.env['wk.class.timetable'].sudo()
+        version = Timetable.get_student_feed_version(selected_student, start_date, end_date)
+        etag = hashlib.sha1(version.encode()).hexdigest()
+        headers = [('ETag', f'"{etag}"'), ('Cache-Control', 'private, no-cache')]
+        if request.httprequest.if_none_match.contains(etag):
+            return request.make_response('', headers=headers, status=304)
+        return request.make_json_response(
+            Timetable.get_student_feed(selected_student, start_date, end_date), headers=headers)
+
+    @http.route(['/school/calendar/<string:kind>/<int:record_id>/<string:token>.ics'], type='http', auth="public", methods=['GET'])
+    def timetable_calendar_feed(self, kind, record_id, token, **kw):
+        model = {'student': 'student.student', 'teacher': 'hr.employee'}.get(kind)
+        record = model and request.env[model].sudo().browse(record_id).exists()
+        if not record or not record.calendar_token or not consteq(record.calendar_token, token):
+            raise NotFound()
+        ics, version = record.get_calendar_ics()
+        etag = hashlib.sha1(version.encode()).hexdigest()
+        headers = [('ETag', f'"{etag}"'), ('Cache-Control', 'private, max-age=900')]
+        if request.httprequest.if_none_match.contains(etag):
+            return request.make_response('', headers=headers, status=304)
+        return request.make_response(ics, headers=headers + [
+            ('Content-Type', 'text/calendar; charset=utf-8'),
+            ('Content-Disposition', f'inline; filename="{kind}-{record_id}.ics"'),
+        ])
 
     @http.route(['/my/notice/board'], type='http', auth="user", website=True)
     def portal_student_notice_board(self, **kw):
@@ -1297,17 +1305,7 @@ class CustomerPortal(Controller):
     def portal_my_fee_slip_payment(self, **kw):
         slip_id = kw.pop('slip_id')
         slip_record = request.env['wk.fee.slip'].sudo().browse(int(slip_id))
-        PaymentLinkWizard = request.env['payment.link.wizard']
-        context = {
-            'res_model': 'wk.fee.slip',
-            'res_id': slip_record.id,
-            'amount': slip_record.total_amount,
-            'currency_id': slip_record.currency_id.id,
-            'partner_id': slip_record.student_id.user_id.partner_id.id,
-        }
-        payment_wizard = PaymentLinkWizard.sudo().with_context(context).create(context)
-        payment_wizard._compute_link()
-        payment_link = payment_wizard.link
+        payment_link = slip_record.get_payment_link()
 
         return request.redirect(payment_link)
 
@@ -1419,21 +1417,40 @@ class CustomerPortal(Controller):
         if not selected_student:
             return request.render('wk_school_management.student_not_found')
 
-        # Get all routes for the student's school/company
-        transport_lines_ids = request.env['transport.trip.line'].sudo().search([
+        TripLine = request.env['transport.trip.line'].sudo()
+        transport_domain = [
             ('student_id', '=', selected_student.id),
             ('company_id', '=', selected_student.company_id.id),
-        ], order = 'trip_id desc')
-        
-        # transport_lines_ids = transport_lines_ids.filtered(lambda line: line.trip_id.state != 'cancelled')
-        
-        values['transport_lines_ids'] = transport_lines_ids
-        
-        student_route_stop = selected_student.route_id.route_stop_ids.filtered(lambda r: r.location_id == selected_student.location_id)
-        values['student_route_stop'] = student_route_stop
+        ]
+        pager = request.website.pager(
+            url="/my/transport",
+            total=TripLine.search_count(transport_domain),
+            page=page,
+            step=20,
+            url_args={'student_id': selected_student.id},
+        )
+        values['pager'] = pager
+        values['transport_lines_ids'] = TripLine.search(
+            transport_domain, order='trip_id desc', limit=20, offset=pager['offset'])
+        values['student_route_stop'] = selected_student._get_transport_stop()
+        values['transport_feed'] = selected_student.get_transport_feed()[0]
 
         return request.render("wk_school_management.portal_transport", values)
     
+    @http.route(['/my/transport/feed'], type='http', auth="user", website=True, methods=['GET'])
+    def portal_transport_feed(self, **kw):
+        """Return today's route, stop and trip status of the student, 304 while unchanged."""
+        context = self._get_student_context()
+        selected_student = context['selected_student']
+        if not selected_student:
+            return request.make_json_response({})
+        feed, version = selected_student.get_transport_feed(request.env.user.tz)
+        etag = hashlib.sha1(version.encode()).hexdigest()
+        headers = [('ETag', f'"{etag}"'), ('Cache-Control', 'private, no-cache')]
+        if request.httprequest.if_none_match.contains(etag):
+            return request.make_response('', headers=headers, status=304)
+        return request.make_json_response(feed, headers=headers)
+
     @http.route(['/my/transport/<model("transport.trip.line"):line_id>'], type='http', auth="user", website=True)
     def portal_student_transport_detail(self, line_id=None, **kw):
         context = self._get_student_context()
@@ -1452,6 +1469,27 @@ class CustomerPortal(Controller):
 
         return request.render("wk_school_management.portal_transport_form_view", values)
 
+    def _get_scannable_trip(self, trip_id):
+        trip = request.env['transport.trip'].browse(int(trip_id)).exists()
+        if not trip:
+            raise NotFound()
+        trip.check_access('write')
+        return trip
+
+    @http.route(['/school_management/transport/scanner/<int:trip_id>'], type='http', auth="user", website=True)
+    def transport_trip_scanner(self, trip_id, **kw):
+        trip = self._get_scannable_trip(trip_id)
+        return request.render("wk_school_management.transport_trip_scanner", {
+            'trip': trip,
+            'totals': trip._get_scan_totals(),
+        })
+
+    @http.route('/school_management/transport/scan', type='json', auth="user")
+    def transport_trip_scan(self, trip_id, scans=None, **kw):
+        """Apply a batch of pickup/dropoff scans queued by the scanner of a trip."""
+        trip = self._get_scannable_trip(trip_id)
+        return trip.apply_scans(scans or [])
+
 
 class MailControllerInherit(MailController):
 
@@ -7,6 +7,7 @@
 #
 #################################################################################
 
+from . import timetable_calendar
 from . import res_company
 from . import application_form
 from . import school_grade
@@ -24,6 +25,7 @@ from . import lesson_plan
 from . import populate_class
 from . import class_timeslot
 from . import weekly_schedule
+from . import schedule_conflict
 from . import class_location
 from . import grade_assignment
 from . import class_assignment
@@ -32,6 +34,7 @@ from . import student_subject
 from . import grade_scale
 from . import assignment_attachment
 from . import ir_menu
+from . import ir_sequence
 from . import res_users
 from . import term_report
 from . import service_hours
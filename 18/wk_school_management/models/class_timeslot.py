@@ -95,4 +95,9 @@ class ClassTimeslot(models.Model):
 
             vals['name'] = str(start) + '-' + str(end)
 
-        return super().write(vals)
+        res = super().write(vals)
+        if 'start_time' in vals or 'end_time' in vals:
+            timetables = self.env['wk.class.timetable'].search([('timeslot_id', 'in', self.ids)])
+            Report = self.env['wk.teaching.load.report']
+            Report._refresh_buckets({Report._get_bucket(timetable) for timetable in timetables})
+        return res
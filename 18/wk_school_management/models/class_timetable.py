@@ -9,7 +9,11 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools import SQL
+from markupsafe import Markup
+from datetime import datetime, time, timedelta
 import math
+import pytz
 
 import logging
 
@@ -34,6 +38,7 @@ class ClassTimetable(models.Model):
         ('draft', 'To Do'),
         ('running', 'Running'),
         ('complete', 'Completed'),
+        ('cancel', 'Cancelled'),
     ], string='Status', default="draft", tracking=True)
     grade_id = fields.Many2one('wk.school.grade', string="Grade")
     section_id = fields.Many2one(
@@ -57,8 +62,12 @@ class ClassTimetable(models.Model):
                                        domain="[('grade_id', '=', grade_id),('section_id', '=', section_id),('subject_id', '=', subject_id),('state','=','approve')]")
     student_ids = fields.Many2many(
         related='populate_class_id.student_ids', string='Students')
+    student_index_ids = fields.Many2many(
+        'student.student', 'wk_class_timetable_student_rel', 'timetable_id', 'student_id',
+        string='Attending Students', compute='_compute_student_index_ids', store=True)
     class_assignments_ids = fields.Many2many(
-        'wk.class.assignment', string='Assignments', compute='_compute_active_assignments')
+        'wk.class.assignment', string='Assignments', compute='_compute_active_assignments',
+        search='_search_class_assignments_ids')
 
     def start_class(self):
         self.ensure_one()
@@ -83,10 +92,112 @@ class ClassTimetable(models.Model):
                     _('Only running classes can be marked as done.'))
             obj.state = 'complete'
 
+    WORKLOAD_FIELDS = {'class_date', 'teacher_id', 'subject_id', 'location_id',
+                       'company_id', 'state', 'timeslot_id', 'start_time', 'end_time'}
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        Report = self.env['wk.teaching.load.report']
+        Report._refresh_buckets({Report._get_bucket(record) for record in records})
+        return records
+
+    def write(self, vals):
+        Report = self.env['wk.teaching.load.report']
+        buckets = set()
+        if self.WORKLOAD_FIELDS & vals.keys() and not self.env.context.get('skip_workload_refresh'):
+            buckets = {Report._get_bucket(record) for record in self}
+        res = super().write(vals)
+        if buckets:
+            buckets |= {Report._get_bucket(record) for record in self}
+            Report._refresh_buckets(buckets)
+        return res
+
     def unlink(self):
         raise ValidationError(
             _('Classes once scheduled cannot be deleted can be only postponed.'))
 
+    @api.constrains('class_date', 'start_time', 'end_time', 'location_id', 'teacher_id', 'state')
+    def _check_schedule_conflict(self):
+        if self.env.context.get('skip_schedule_conflict'):
+            return
+        self.env['wk.schedule.conflict'].check_timetables(self)
+
+    def reschedule_classes(self, shift_days=0, cancel=False, location_id=None, teacher_id=None, reason=None):
+        """Shift, move or cancel the classes at once.
+
+        The classes are written through the ORM, one write per class date and
+        period (plus one for the location and teacher), and renamed with one
+        query per class date; the teaching load and the conflicts of the whole
+        set are refreshed and checked once at the end and every class involved
+        gets a single summary note instead of a tracking message per session.
+        """
+        if not self:
+            return 0
+        if any(record.state != 'draft' for record in self):
+            raise UserError(_('Only classes not yet started can be rescheduled or cancelled.'))
+        if not cancel and not (shift_days or location_id or teacher_id):
+            raise UserError(_('Please set the number of days, the location or the teacher to move the classes to.'))
+
+        Report = self.env['wk.teaching.load.report']
+        buckets = {Report._get_bucket(record) for record in self}
+        records = self.with_context(tracking_disable=True, skip_schedule_conflict=True, skip_workload_refresh=True)
+        if cancel:
+            records.write({'state': 'cancel'})
+        else:
+            if shift_days:
+                delta = timedelta(days=shift_days)
+                for class_date, date_classes in records.grouped('class_date').items():
+                    if not class_date:
+                        continue
+                    new_date = class_date + delta
+                    for (start_time, end_time), classes in date_classes.grouped(
+                            lambda t: (t.start_time, t.end_time)).items():
+                        classes.write({
+                            'class_date': new_date,
+                            'day': self.DAYS[new_date.weekday()][0],
+                            'start_time': start_time and start_time + delta,
+                            'end_time': end_time and end_time + delta,
+                        })
+                    # the name only carries the date, it has no constraint nor dependent field
+                    date_classes.flush_recordset(['name'])
+                    self.env.cr.execute(SQL(
+                        "UPDATE wk_class_timetable SET name = replace(name, %(old)s, %(new)s) WHERE id IN %(ids)s",
+                        old=f"({class_date})", new=f"({new_date})", ids=tuple(date_classes.ids)))
+                    date_classes.invalidate_recordset(['name'])
+                    date_classes.modified(['name'])
+            moved = {}
+            if location_id:
+                moved['location_id'] = location_id
+            if teacher_id:
+                moved['teacher_id'] = teacher_id
+            if moved:
+                records.write(moved)
+            self.env['wk.schedule.conflict'].check_timetables(self)
+        Report._refresh_buckets(buckets | {Report._get_bucket(record) for record in self})
+
+        if cancel:
+            summary = _("%(count)s class(es) cancelled.")
+        elif shift_days > 0:
+            summary = _("%(count)s class(es) postponed by %(days)s day(s).")
+        elif shift_days < 0:
+            summary = _("%(count)s class(es) brought forward by %(days)s day(s).")
+        else:
+            summary = _("%(count)s class(es) moved.")
+        bodies = {}
+        for populate_class, classes in self.grouped('populate_class_id').items():
+            if not populate_class:
+                continue
+            body = Markup("<p>%s</p><ul>%s</ul>") % (
+                summary % {'count': len(classes), 'days': abs(shift_days)},
+                Markup().join(Markup("<li>%s</li>") % name for name in classes.mapped('name')))
+            if reason:
+                body += Markup("<p>%s <strong>%s</strong></p>") % (_("Reason:"), reason)
+            bodies[populate_class.id] = body
+        if bodies:
+            self.env['wk.school.class'].browse(list(bodies))._message_log_batch(bodies)
+        return len(self)
+
     def record_student_discipline(self):
         self.ensure_one()
         action = {
@@ -117,6 +228,19 @@ class ClassTimetable(models.Model):
         final_time = str(hours).zfill(2) + ':' + str(minutes) + ' ' + tz
         return final_time
 
+    @api.model
+    def _get_school_tz(self, company=None):
+        company = company or self.env.company
+        return company.resource_calendar_id.tz or self.env.user.tz or 'UTC'
+
+    @api.model
+    def get_slot_datetime(self, class_date, float_time, tz_name):
+        """Return the naive UTC datetime of a float hour of the day in the given timezone."""
+        hours, minutes = divmod(round(float_time * 60), 60)
+        local_datetime = datetime.combine(class_date, time(int(hours) % 24, int(minutes)))
+        local_datetime = pytz.timezone(tz_name).localize(local_datetime)
+        return local_datetime.astimezone(pytz.utc).replace(tzinfo=None)
+
     def mark_class_attendance(self):
         self.ensure_one()
         class_attendance_ids = self.env['wk.student.class.attendance'].search(
@@ -148,20 +272,135 @@ class ClassTimetable(models.Model):
             'domain': [('student_id', 'in', self.student_ids.student_id.ids), ('class_date', '=', self.class_date)]
         }
 
+    @api.depends('populate_class_id.student_ids.student_id')
+    def _compute_student_index_ids(self):
+        for record in self:
+            record.student_index_ids = record.populate_class_id.student_ids.student_id
+
+    @api.model
+    def _get_student_feed_domain(self, student, start_date=None, end_date=None):
+        domain = [('student_index_ids', 'in', student.ids), ('state', '!=', 'cancel')]
+        if start_date:
+            domain.append(('class_date', '>=', start_date))
+        if end_date:
+            domain.append(('class_date', '<=', end_date))
+        return domain
+
+    @api.model
+    def get_student_feed_version(self, student, start_date, end_date):
+        """Return a key changing whenever a class of the student in the window changes."""
+        self.flush_model()
+        domain = self._get_student_feed_domain(student, start_date, end_date)
+        query = self._search(domain)
+        self.env.cr.execute(query.select('COUNT(*)', 'MAX("wk_class_timetable"."write_date")'))
+        count, last_write = self.env.cr.fetchone()
+        return f"{student.id}-{start_date}-{end_date}-{count}-{last_write}"
+
+    @api.model
+    def get_student_feed(self, student, start_date, end_date, limit=None, offset=0):
+        """Return the calendar events of the student between the two dates.
+
+        Only the fields shown in the calendar are read and the window is
+        paginated in the database.
+        """
+        rows = self.search_read(
+            self._get_student_feed_domain(student, start_date, end_date),
+            ['class_date', 'start_time', 'end_time', 'state', 'timeslot_id', 'subject_id', 'location_id'],
+            offset=offset, limit=limit, order='class_date, start_time, id')
+        timeslots = {
+            slot['id']: slot for slot in self.env['wk.class.timeslot'].browse(
+                {row['timeslot_id'][0] for row in rows if row['timeslot_id']}).read(['start_time', 'end_time'])
+        }
+        Timeslot = self.env['wk.class.timeslot']
+        events = []
+        for row in rows:
+            slot = timeslots.get(row['timeslot_id'] and row['timeslot_id'][0], {})
+            if row['start_time'] and row['end_time']:
+                start = row['start_time'].isoformat() + 'Z'
+                end = row['end_time'].isoformat() + 'Z'
+            else:
+                start = f"{row['class_date']}T{self.get_slot_time(slot.get('start_time', 0.0), calendar_time=True)}"
+                end = f"{row['class_date']}T{self.get_slot_time(slot.get('end_time', 0.0), calendar_time=True)}"
+            subject = row['subject_id'] and row['subject_id'][1] or ''
+            location = row['location_id'] and row['location_id'][1] or ''
+            events.append({
+                'id': row['id'],
+                'title': f"{subject}-({location})",
+                'start': start,
+                'end': end,
+                'color': '#bbcffb',
+                'extendedProps': {
+                    'date': str(row['class_date']),
+                    'start_time': Timeslot.float_to_time(slot['start_time']) if slot else '',
+                    'end_time': Timeslot.float_to_time(slot['end_time']) if slot else '',
+                    'location': location,
+                },
+            })
+        return events
+
     @api.depends('populate_class_id', 'class_date')
     def _compute_active_assignments(self):
+        assignments = self.env['wk.class.assignment'].search([
+            ('class_id', 'in', self.populate_class_id.ids)
+        ]) if self.populate_class_id else self.env['wk.class.assignment']
+        assignments_by_class = assignments.grouped('class_id')
         for record in self:
             if record.populate_class_id and record.class_date:
-                assignments = self.env['wk.class.assignment'].search([
-                    ('class_id', '=', record.populate_class_id.id)
-                ])
-                active_assignments = assignments.filtered(
+                record.class_assignments_ids = assignments_by_class.get(
+                    record.populate_class_id, self.env['wk.class.assignment']).filtered(
                     lambda a: a.start_date <= record.class_date <= a.end_date)
-
-                record.class_assignments_ids = active_assignments
             else:
                 record.class_assignments_ids = False
 
+    def _search_class_assignments_ids(self, operator, value):
+        """Match the classes by the assignments running on their class date, in SQL."""
+        if operator not in ('in', 'not in', '=', '!='):
+            raise UserError(_('Unsupported operator %s for active assignments.', operator))
+        positive = operator in ('in', '=')
+        if value is False:
+            # ('class_assignments_ids', '=', False) matches classes without active assignment
+            value, positive = [], not positive
+        elif not value:
+            return [('id', '=', 0)] if positive else []
+        elif isinstance(value, int):
+            value = [value]
+        condition = SQL("a.id IN %s", tuple(value)) if value else SQL("TRUE")
+        subquery = SQL(
+            """SELECT t.id
+                 FROM wk_class_timetable t
+                 JOIN wk_class_assignment a ON a.class_id = t.populate_class_id
+                WHERE t.class_date BETWEEN a.start_date AND a.end_date
+                  AND %s""", condition)
+        return [('id', 'in' if positive else 'not in', subquery)]
+
+    @api.model
+    def get_dashboard_classes(self, domain, limit=20, offset=0):
+        """Return a page of the classes of the domain as light rows, upcoming ones first.
+
+        Ordering and pagination are done in SQL so only the rows of the page
+        are read.
+        """
+        query = self._search(domain)
+        class_date = self._field_to_sql(self._table, 'class_date', query)
+        query.order = SQL("CASE WHEN %s >= %s THEN 0 ELSE 1 END, %s, %s",
+                          class_date, fields.Date.context_today(self), class_date,
+                          SQL.identifier(self._table, 'id'))
+        query.limit = limit
+        query.offset = offset
+        classes = self.browse(query)
+        state_labels = dict(self._fields['state']._description_selection(self.env))
+        rows = [{
+            'id': timetable.id,
+            'name': timetable.name,
+            'teacher': timetable.teacher_id.name or '',
+            'class_date': fields.Date.to_string(timetable.class_date),
+            'timeslot': timetable.timeslot_id.name or '',
+            'location': timetable.location_id.name or '',
+            'state': timetable.state,
+            'state_label': state_labels.get(timetable.state),
+        } for timetable in classes]
+        return {'rows': rows, 'total': self.search_count(domain), 'offset': offset}
+
     @api.model
     def fetch_data_for_dashboard(self, date_range=None, **kwarg):
         fetch_data = {}
@@ -7,13 +7,21 @@
 #
 #################################################################################
 
+from collections import defaultdict
 from datetime import timedelta, date
+from urllib.parse import urlencode
 import logging
+import base64
+import uuid
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.addons.payment import utils as payment_utils
 
 _logger = logging.getLogger(__name__)
 
+# Number of cron runs a fee receipt is tried before giving up on it.
+RECEIPT_MAX_ATTEMPTS = 3
+
 
 class FeeSummary(models.Model):
 
@@ -79,6 +87,22 @@ class FeeSlip(models.Model):
     transaction_ids = fields.Many2one('payment.transaction', string="Payment", compute="_compute_transaction_ids")
     company_id = fields.Many2one(
         'res.company', string="School", default=lambda self: self.env.company, required=True)
+    receipt_pending = fields.Boolean(string="Receipt Pending", copy=False, index=True)
+    receipt_attempts = fields.Integer(string="Receipt Attempts", copy=False)
+
+    # Enforced by PostgreSQL so that concurrent workers and bulk imports cannot
+    # create overlapping slips; the integer range avoids needing btree_gist.
+    # LEAST/GREATEST keep reversed dates to the 'Date From' validation error.
+    _sql_constraints = [
+        (
+            'enrollment_date_overlap',
+            "EXCLUDE USING gist ("
+            "int4range(enrollment_id, enrollment_id, '[]') WITH &&, "
+            "daterange(LEAST(date_from, date_to), GREATEST(date_from, date_to), '[]') WITH &&"
+            ") WHERE (enrollment_id IS NOT NULL)",
+            'Date range overlaps with another fee slip for the same enrollment.'
+        ),
+    ]
 
     def unlink(self):
         for slip in self:
@@ -92,24 +116,6 @@ class FeeSlip(models.Model):
             if record.date_from and record.date_to and record.date_from > record.date_to:
                 raise ValidationError("The 'Date From' must be earlier than or equal to 'Date To'.")
 
-    @api.constrains('date_from', 'date_to', 'enrollment_id')
-    def _check_date_overlap(self):
-        for slip in self:
-            if not slip.enrollment_id or not slip.date_from or not slip.date_to:
-                continue
-
-            domain = [
-                ('id', '!=', slip.id),
-                ('enrollment_id', '=', slip.enrollment_id.id),
-                ('date_from', '<=', slip.date_to),
-                ('date_to', '>=', slip.date_from),
-            ]
-            overlapping = self.search(domain)
-            if overlapping:
-                raise ValidationError(
-                    "Date range overlaps with another fee slip for the same enrollment."
-                )
-
     @api.depends('fee_slip_line_ids.fee')
     def compute_total_amount_per_slip(self):
         for lines in self:
@@ -123,13 +129,36 @@ class FeeSlip(models.Model):
         for slip in self:
             if not slip.student_id.user_id:
                 raise UserError(_(f"The student {slip.student_id.name} does not have portal access.Please provide portal access to proceed!")) 
-            if slip.state == 'new':
+        slips = self.filtered(lambda s: s.state == 'new')
+        for company, company_slips in slips.grouped('company_id').items():
+            names = self.env['ir.sequence'].with_company(company).next_batch_by_code(
+                'wk.fee.slip.sequence', len(company_slips))
+            for slip, name in zip(company_slips, names):
                 values = {
                     'state': 'to_pay',
-                    'name': self.env['ir.sequence'].next_by_code('wk.fee.slip.sequence') or _('/'),
+                    'name': name or _('/'),
+                    'access_token': slip.access_token or str(uuid.uuid4()),
                 }
                 slip.write(values)
 
+    def action_confirm_and_notify(self):
+        """Confirm a fee run at once and send one mail per guardian listing all the slips of their children."""
+        slips = self.filtered(lambda s: s.state == 'new')
+        slips.confirm_fee_slip()
+        slips._notify_fee_slips_to_parents()
+
+    def _notify_fee_slips_to_parents(self):
+        mail_template = self.env.ref('wk_school_management.fee_slip_batch_notification_mail', raise_if_not_found=False)
+        if not mail_template:
+            return
+        slips_by_partner = defaultdict(lambda: self.browse())
+        for slip in self:
+            partners = slip.student_id.parent_ids or slip.student_id.user_id.partner_id
+            for partner in partners:
+                slips_by_partner[partner] |= slip
+        for partner, partner_slips in slips_by_partner.items():
+            mail_template.with_context(fee_slips=partner_slips).send_mail(partner.id)
+
     def pay_fee_slip(self):
         self.ensure_one()
         PaymentLinkWizard = self.env['payment.link.wizard']
@@ -171,6 +200,46 @@ class FeeSlip(models.Model):
                     mail_template.send_mail(slip.id)
                 slip.state = 'overdue'
 
+    def _prepare_receipt_attachment(self):
+        self.ensure_one()
+        report_content = self.env['ir.actions.report']\
+            .with_context(force_report_rendering=True)\
+            ._render('account.account_invoices', self.invoice_id.id)
+        return self.env['ir.attachment'].create({
+            'name': f'Invoice_{self.invoice_id.name}.pdf',
+            'type': 'binary',
+            'datas': base64.b64encode(report_content[0]),
+            'res_model': 'wk.fee.slip',
+            'res_id': self.id,
+            'mimetype': 'application/pdf',
+        })
+
+    def send_fee_receipt(self, batch_size=50):
+        """Cron job rendering the invoice receipts of paid fee slips and mailing them to the students.
+
+        A receipt failing RECEIPT_MAX_ATTEMPTS times is no longer retried.
+        """
+        mail_template = self.env.ref('wk_school_management.fee_slip_success_mail', raise_if_not_found=False)
+        slips = self.search([('receipt_pending', '=', True)], order='receipt_attempts, id', limit=batch_size + 1)
+        done_slips = self.browse()
+        for slip in slips[:batch_size]:
+            if mail_template and slip.invoice_id.state == 'posted':
+                try:
+                    with self.env.cr.savepoint():
+                        attachment = slip._prepare_receipt_attachment()
+                        mail_template.send_mail(slip.id, email_values={'attachment_ids': [attachment.id]})
+                except Exception:
+                    _logger.exception("Fee receipt for slip %s could not be sent (attempt %s of %s)",
+                                      slip.name, slip.receipt_attempts + 1, RECEIPT_MAX_ATTEMPTS)
+                    slip.receipt_attempts += 1
+                    if slip.receipt_attempts < RECEIPT_MAX_ATTEMPTS:
+                        continue
+                    _logger.warning("Fee receipt for slip %s is not retried anymore", slip.name)
+            done_slips |= slip
+        done_slips.receipt_pending = False
+        if done_slips and len(slips) > batch_size:
+            self.env.ref('wk_school_management.ir_cron_send_fee_receipt')._trigger()
+
     def _get_default_payment_link_values(self):
         self.ensure_one()
         amount_max = self.total_amount
@@ -254,6 +323,17 @@ class FeeSlip(models.Model):
         payment_url = self.get_base_url() + self._get_share_url(redirect=True)
         return payment_url
 
+    def get_payment_link(self):
+        """Return the payment link of the slip without going through a payment.link.wizard."""
+        self.ensure_one()
+        partner_id = self.student_id.user_id.partner_id.id
+        query_params = {
+            'amount': self.total_amount,
+            'access_token': payment_utils.generate_access_token(partner_id, self.total_amount, self.currency_id.id),
+            'fee_slip_id': self.id,
+        }
+        return f'{self.get_base_url()}/payment/pay?{urlencode(query_params)}'
+
 
 class FeeSlipLine(models.Model):
 
@@ -13,7 +13,8 @@ _logger = logging.getLogger(__name__)
 
 class HrEmployee(models.Model):
 
-    _inherit = "hr.employee"
+    _inherit = ["hr.employee", "wk.timetable.calendar.mixin"]
+    _calendar_feed_kind = 'teacher'
 
     is_teacher = fields.Boolean(string="Is a teacher ?", groups="base.group_user")
     is_supervisor = fields.Boolean(string="Is a supervisor?", groups="base.group_user")
@@ -34,6 +35,9 @@ class HrEmployee(models.Model):
     activity_exception_icon = fields.Char(groups="base.group_user")
     attendance_manager_id = fields.Many2one(groups="base.group_user")
 
+    def _get_calendar_timetable_domain(self):
+        return [('teacher_id', 'in', self.ids)]
+
     def action_create_user(self):
         self.ensure_one()
         res = super().action_create_user()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+#################################################################################
+#
+# Copyright (c) 2016-Present Webkul Software Pvt. Ltd. (<https://webkul.com/>; )
+# See LICENSE file for full copyright and licensing details.
+# License URL : <https://store.webkul.com/license.html/>;
+#
+#################################################################################
+from odoo import models, api
+import logging
+_logger = logging.getLogger(__name__)
+
+
+class IrSequence(models.Model):
+    _inherit = "ir.sequence"
+
+    def _next_batch(self, count):
+        """ Reserve ``count`` consecutive numbers of the sequence at once. """
+        self.ensure_one()
+        if count <= 0:
+            return []
+        if self.use_date_range:
+            return [self._next() for _index in range(count)]
+        if self.implementation == 'standard':
+            self.env.cr.execute(
+                "SELECT nextval(%s) FROM generate_series(1, %s)",
+                ('ir_sequence_%03d' % self.id, count))
+            numbers = [row[0] for row in self.env.cr.fetchall()]
+        else:
+            self.env.cr.execute(
+                "UPDATE ir_sequence SET number_next = number_next + %s WHERE id = %s RETURNING number_next",
+                (self.number_increment * count, self.id))
+            last_number = self.env.cr.fetchone()[0]
+            self.invalidate_recordset(['number_next'])
+            first_number = last_number - self.number_increment * count
+            numbers = [first_number + index * self.number_increment for index in range(count)]
+        return [self.get_next_char(number) for number in numbers]
+
+    @api.model
+    def next_batch_by_code(self, sequence_code, count):
+        """ Batch counterpart of ``next_by_code``: return ``count`` sequence
+        numbers, reserved with a single query, or a list of False if no
+        sequence is found for the current company.
+        """
+        self.check_access('read')
+        company_id = self.env.company.id
+        sequence = self.search([('code', '=', sequence_code), ('company_id', 'in', [company_id, False])],
+                               order='company_id', limit=1)
+        if not sequence:
+            _logger.debug("No ir.sequence has been found for code '%s'.", sequence_code)
+            return [False] * count
+        return sequence._next_batch(count)
@@ -9,7 +9,6 @@
 
 from odoo import models, fields, api, _, Command, SUPERUSER_ID
 import logging
-import base64
 
 _logger = logging.getLogger(__name__)
 
@@ -74,25 +73,15 @@ class PaymentTransaction(models.Model):
             confirmed_fee_slips.invoice_id.payment_state = 'paid'
         super()._post_process()
 
-        if confirmed_fee_slips.invoice_id and confirmed_fee_slips.invoice_id.state == 'posted':
-            mail_template = self.env.ref('wk_school_management.fee_slip_success_mail', raise_if_not_found=False)
-            if mail_template:
-                report_action = self.env['ir.actions.report']\
-                    .with_context(force_report_rendering=True)\
-                    ._render('account.account_invoices', confirmed_fee_slips.invoice_id.id)
-
-                report_base64 = base64.b64encode(report_action[0])
-                attachment = self.env['ir.attachment'].create({
-                'name': f'Invoice_{confirmed_fee_slips.invoice_id.name}.pdf',
-                'type': 'binary',
-                'datas': report_base64,
-                'res_model': 'wk.fee.slip',
-                'res_id': confirmed_fee_slips.id,
-                'mimetype': 'application/pdf',
-                })
-
-                mail_template.attachment_ids = attachment
-                mail_template.send_mail(confirmed_fee_slips.id)
+        receipt_slips = confirmed_fee_slips.filtered(
+            lambda fs: fs.invoice_id and fs.invoice_id.state == 'posted')
+        if receipt_slips:
+            # Receipts are rendered by a cron so that the payment callback is not
+            # held back by the PDF rendering.
+            receipt_slips.write({'receipt_pending': True, 'receipt_attempts': 0})
+            receipt_cron = self.env.ref('wk_school_management.ir_cron_send_fee_receipt', raise_if_not_found=False)
+            if receipt_cron:
+                receipt_cron._trigger()
 
     def action_view_fee_slip(self):
         action = {
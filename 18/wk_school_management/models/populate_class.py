@@ -6,8 +6,10 @@
 # License URL : <https://store.webkul.com/license.html/>;
 #
 #################################################################################
-from odoo import models, fields, api, _
+from odoo import models, fields, api, Command, _
 from odoo.exceptions import ValidationError, UserError
+from odoo.tools import SQL
+from collections import defaultdict
 from datetime import date
 import logging
 
@@ -61,6 +63,10 @@ class PopulateClass(models.Model):
     unit_credit = fields.Float(string="Unit Credit")
     weekly_schedule_ids = fields.One2many(
         'wk.weekly.schedule', 'populate_class_id', string="Weekly Schedule")
+    weekly_periods = fields.Integer(string="Weekly Periods",
+        help="Number of periods per week used by the timetable generator.")
+    location_ids = fields.Many2many('wk.class.location', string="Preferred Locations",
+        help="Locations the timetable generator may use for this class, all of them if empty.")
     timetable_ids = fields.One2many(
         'wk.class.timetable', 'populate_class_id', string='Timetable')
     timetable_count = fields.Integer(
@@ -82,32 +88,100 @@ class PopulateClass(models.Model):
             else:
                 obj.total_enrolled = 0
 
-    @api.depends('subject_id', 'grade_id', 'session_id', 'academic_year_id', 'section_id')
+    @api.model
+    def _get_available_students(self, grade, subject, term, session, academic_year, section=None,
+                                exclude_class_ids=()):
+        """Return the student subjects not yet placed in a class of the same grade, subject and term.
+
+        The students already placed are excluded with a NOT EXISTS anti-join on
+        the class/student relation instead of a growing list of ids.
+        """
+        student_domain = [
+            ('grade_id', '=', grade.id),
+            ('subject_id', '=', subject.id),
+            ('session_id', '=', session.id),
+            ('academic_year_id', '=', academic_year.id)]
+        if section:
+            student_domain.append(('section_id', '=', section.id))
+        StudentSubjects = self.env['wk.student.subjects']
+        self.flush_model(['grade_id', 'subject_id', 'term_id', 'section_id', 'student_ids'])
+        field = self._fields['student_ids']
+        query = StudentSubjects._search(student_domain)
+        query.add_where(SQL(
+            """NOT EXISTS (
+                SELECT 1
+                  FROM %(relation)s rel
+                  JOIN wk_school_class c ON c.id = rel.%(class_column)s
+                 WHERE rel.%(student_column)s = %(student_table)s.id
+                   AND c.grade_id = %(grade)s
+                   AND c.subject_id = %(subject)s
+                   AND c.term_id = %(term)s
+                   AND c.id NOT IN %(excluded)s
+                   %(section)s
+            )""",
+            relation=SQL.identifier(field.relation),
+            class_column=SQL.identifier(field.column1),
+            student_column=SQL.identifier(field.column2),
+            student_table=SQL.identifier(StudentSubjects._table),
+            grade=grade.id, subject=subject.id, term=term.id,
+            excluded=tuple(exclude_class_ids) or (0,),
+            section=SQL("AND c.section_id = %s", section.id) if section else SQL()))
+        return StudentSubjects.browse(query)
+
+    @api.depends('subject_id', 'grade_id', 'session_id', 'academic_year_id', 'section_id', 'term_id')
     def get_student_ids_domain(self):
         for record in self:
-            if record.grade_id and record.subject_id and record.academic_year_id:
-                base_domain = [('grade_id', '=', record.grade_id.id),
-                                ('subject_id', '=', record.subject_id.id),
-                                ('term_id', '=', record.term_id.id)]
-                if record.section_id:
-                    base_domain.append(('section_id', '=', record.section_id.id))
-                excluded_students = self.search(
-                    base_domain + [('id', '!=', record._origin.id)]).mapped('student_ids.id')
-
-                student_domain = [
-                    ('grade_id', '=', record.grade_id.id),
-                    ('subject_id', '=', record.subject_id.id),
-                    ('session_id', '=', record.session_id.id),
-                    ('academic_year_id', '=', record.academic_year_id.id),
-                    ('id', 'not in', excluded_students)]
-
-                if record.section_id:
-                    student_domain.append(('section_id', '=', record.section_id.id))
-                students = self.env['wk.student.subjects'].search(student_domain)
-                record.student_ids_domain = students
+            if record.grade_id and record.subject_id and record.academic_year_id and record.term_id:
+                record.student_ids_domain = self._get_available_students(
+                    record.grade_id, record.subject_id, record.term_id, record.session_id,
+                    record.academic_year_id, section=record.section_id,
+                    exclude_class_ids=[record._origin.id] if record._origin.id else [])
             else:
                 record.student_ids_domain = False
 
+    def action_auto_populate(self):
+        """Fill the classes with the students not yet placed, up to their capacity.
+
+        Classes are grouped by grade, subject and term; the available students
+        of a group are fetched once and dealt in one pass, a section class
+        taking the students of its section first and the classes without
+        section the remaining ones.
+        """
+        classes = self.filtered(lambda c: c.state != 'complete')
+        placed = 0
+        groups = classes.grouped(lambda c: (c.grade_id, c.subject_id, c.term_id, c.session_id, c.academic_year_id))
+        for (grade, subject, term, session, academic_year), group_classes in groups.items():
+            # The students already placed in a class of the group, these classes
+            # included, are not available: a second run places nobody twice.
+            students = self._get_available_students(grade, subject, term, session, academic_year)
+            students -= group_classes.student_ids
+            seats = {populate_class: populate_class.capacity - len(populate_class.student_ids)
+                     for populate_class in group_classes}
+            by_section = group_classes.filtered('section_id').grouped('section_id')
+            without_section = group_classes.filtered(lambda c: not c.section_id)
+            assignment = defaultdict(list)
+            for student in students.sorted('name'):
+                candidates = by_section.get(student.section_id, self.browse()) | without_section
+                target = next((c for c in candidates if seats[c] > 0), None)
+                if target:
+                    seats[target] -= 1
+                    assignment[target].append(student.id)
+            for populate_class, student_ids in assignment.items():
+                populate_class.write({'student_ids': [Command.link(student_id) for student_id in student_ids]})
+                placed += len(student_ids)
+
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Classes Populated'),
+            'res_model': 'wk.message.wizard',
+            'views': [(self.env.ref('wk_school_management.wk_message_wizard_view_form_success').id, 'form')],
+            'target': 'new',
+            'context': {
+                'default_message': _("%(count)s student(s) have been placed in %(classes)s class(es).",
+                                     count=placed, classes=len(classes))
+            }
+        }
+
     @api.model_create_multi
     def create(self, vals_list):
         for vals in vals_list:
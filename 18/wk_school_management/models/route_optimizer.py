@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#################################################################################
+#
+# Copyright (c) 2016-Present Webkul Software Pvt. Ltd. (<https://webkul.com/>; )
+# See LICENSE file for full copyright and licensing details.
+# License URL : <https://store.webkul.com/license.html/>;
+#
+#################################################################################
+from math import radians, sin, cos, asin, sqrt
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine(point, other):
+    """Return the great-circle distance in km between two (latitude, longitude) points."""
+    lat1, lon1 = map(radians, point)
+    lat2, lon2 = map(radians, other)
+    value = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(value))
+
+
+class RouteOptimizer:
+    """Order the stops of a bus route on a precomputed distance matrix.
+
+    The route is an open path starting at the school (node 0) and visiting
+    every stop once, i.e. the afternoon dropoff; the morning pickup is the
+    same path reversed. The path is built nearest neighbor first, then
+    improved with 2-opt segment reversals and Or-opt moves of one to three
+    consecutive stops until no move shortens it.
+    """
+
+    def __init__(self, points):
+        # points: [(latitude, longitude)], the school first
+        self.size = len(points)
+        self.matrix = [[haversine(point, other) for other in points] for point in points]
+
+    def length(self, path):
+        return sum(self.matrix[path[index]][path[index + 1]] for index in range(len(path) - 1))
+
+    def nearest_neighbor(self):
+        path = [0]
+        remaining = set(range(1, self.size))
+        while remaining:
+            row = self.matrix[path[-1]]
+            node = min(remaining, key=row.__getitem__)
+            path.append(node)
+            remaining.remove(node)
+        return path
+
+    def _edge(self, path, index):
+        """Length of the edge leaving path[index], 0 after the last stop."""
+        return self.matrix[path[index]][path[index + 1]] if index + 1 < len(path) else 0.0
+
+    def two_opt(self, path):
+        matrix = self.matrix
+        improved = True
+        while improved:
+            improved = False
+            for i in range(1, len(path) - 1):
+                for j in range(i + 1, len(path)):
+                    before = matrix[path[i - 1]][path[i]] + self._edge(path, j)
+                    after = matrix[path[i - 1]][path[j]] + (
+                        matrix[path[i]][path[j + 1]] if j + 1 < len(path) else 0.0)
+                    if after < before - 1e-9:
+                        path[i:j + 1] = reversed(path[i:j + 1])
+                        improved = True
+        return path
+
+    def or_opt(self, path):
+        matrix = self.matrix
+        improved = True
+        while improved:
+            improved = False
+            for segment_size in (1, 2, 3):
+                for start in range(1, len(path) - segment_size + 1):
+                    end = start + segment_size
+                    segment = path[start:end]
+                    rest = path[:start] + path[end:]
+                    previous = path[start - 1]
+                    inner = self.length(segment)
+                    removed_gain = matrix[previous][segment[0]] + inner + (
+                        matrix[segment[-1]][path[end]] - matrix[previous][path[end]]
+                        if end < len(path) else 0.0)
+                    best_move, best_cost = None, removed_gain - 1e-9
+                    for position in range(1, len(rest) + 1):
+                        if position == start:
+                            continue
+                        before = rest[position - 1]
+                        after = rest[position] if position < len(rest) else None
+                        for candidate in (segment, segment[::-1]):
+                            cost = matrix[before][candidate[0]] + inner + (
+                                matrix[candidate[-1]][after] - matrix[before][after] if after is not None else 0.0)
+                            if cost < best_cost:
+                                best_move, best_cost = (position, candidate), cost
+                    if best_move:
+                        position, candidate = best_move
+                        path[:] = rest[:position] + candidate + rest[position:]
+                        improved = True
+        return path
+
+    def solve(self):
+        """Return the optimized path of node indexes, starting with the school."""
+        path = self.nearest_neighbor()
+        while True:
+            length = self.length(path)
+            self.or_opt(self.two_opt(path))
+            if self.length(path) >= length - 1e-9:
+                return path
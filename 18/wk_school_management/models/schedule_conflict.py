@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+#################################################################################
+#
+# Copyright (c) 2016-Present Webkul Software Pvt. Ltd. (<https://webkul.com/>; )
+# See LICENSE file for full copyright and licensing details.
+# License URL : <https://store.webkul.com/license.html/>;
+#
+#################################################################################
+
+from odoo import models, api, _
+from odoo.exceptions import ValidationError
+from collections import defaultdict
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class IntervalTree:
+    """Static interval tree over half-open (start, end, payload) intervals.
+
+    The intervals are kept sorted by start and seen as an implicit balanced
+    tree, every node storing the greatest end of its subtree, so a query only
+    walks the branches that can still overlap.
+    """
+
+    def __init__(self, intervals):
+        self.intervals = sorted(intervals, key=lambda interval: interval[0])
+        self.max_end = [None] * len(self.intervals)
+        self._build(0, len(self.intervals))
+
+    def _build(self, low, high):
+        if low >= high:
+            return None
+        mid = (low + high) // 2
+        max_end = self.intervals[mid][1]
+        for child_end in (self._build(low, mid), self._build(mid + 1, high)):
+            if child_end is not None and child_end > max_end:
+                max_end = child_end
+        self.max_end[mid] = max_end
+        return max_end
+
+    def overlap(self, start, end):
+        """Return the payloads of the intervals overlapping [start, end)."""
+        result = []
+        stack = [(0, len(self.intervals))]
+        while stack:
+            low, high = stack.pop()
+            if low >= high:
+                continue
+            mid = (low + high) // 2
+            if self.max_end[mid] <= start:
+                continue
+            stack.append((low, mid))
+            node_start, node_end, payload = self.intervals[mid]
+            if node_start < end:
+                if node_end > start:
+                    result.append(payload)
+                stack.append((mid + 1, high))
+        return result
+
+
+class ScheduleConflict(models.AbstractModel):
+
+    _name = 'wk.schedule.conflict'
+    _description = 'Schedule Conflict Detection'
+
+    @api.model
+    def _build_trees(self, entries):
+        """Group (keys, start, end, record) entries in one interval tree per key."""
+        intervals = defaultdict(list)
+        for keys, start, end, record in entries:
+            for key in keys:
+                intervals[key].append((start, end, record))
+        return {key: IntervalTree(values) for key, values in intervals.items()}
+
+    @api.model
+    def _find_conflicts(self, records, entries, compatible=None):
+        """Return the (record, other, key) conflicts of the records against the entries.
+
+        Every pair is reported once, whatever the number of records of the
+        batch involved in it.
+        """
+        trees = self._build_trees(entries)
+        by_record = {entry[3]: entry for entry in entries}
+        conflicts = []
+        seen = set()
+        for record in records:
+            if record not in by_record:
+                continue
+            keys, start, end, _record = by_record[record]
+            for key in keys:
+                for other in trees[key].overlap(start, end):
+                    pair = (key, frozenset((record.id, other.id)))
+                    if other == record or pair in seen:
+                        continue
+                    if compatible and compatible(record, other):
+                        continue
+                    seen.add(pair)
+                    conflicts.append((record, other, key))
+        return conflicts
+
+    @api.model
+    def _raise_conflicts(self, messages):
+        if messages:
+            raise ValidationError(
+                _("The schedule has %s conflict(s):\n", len(messages)) + "\n".join(messages))
+
+    @api.model
+    def _get_teachers(self, teacher, populate_class):
+        """Return the teacher and the secondary teachers of the class, all of them booked."""
+        return teacher | populate_class.teacher_ids
+
+    @api.model
+    def _weekly_schedule_entry(self, schedule):
+        keys = [(schedule.weekday, 'location', schedule.location_id.id)]
+        teachers = self._get_teachers(schedule.populate_class_id.teacher_id, schedule.populate_class_id)
+        keys += [(schedule.weekday, 'teacher', teacher.id) for teacher in teachers]
+        return (keys, schedule.timeslot_id.start_time, schedule.timeslot_id.end_time, schedule)
+
+    @api.model
+    def get_weekly_schedule_conflicts(self, schedules):
+        """Return the conflict messages of the weekly schedules.
+
+        The schedules of the same weekdays are loaded once and checked against
+        each other per location and per teacher; the classes already completed
+        or running on disjoint dates are not taken into account.
+        """
+        schedules = schedules.filtered(lambda s: s.timeslot_id and s.location_id)
+        if not schedules:
+            return []
+        others = self.env['wk.weekly.schedule'].sudo().search([
+            ('weekday', 'in', list(set(schedules.mapped('weekday')))),
+            '|', ('populate_class_id', '=', False), ('populate_class_id.state', '!=', 'complete'),
+        ])
+        entries = [self._weekly_schedule_entry(schedule) for schedule in others | schedules]
+
+        def compatible(schedule, other):
+            first, second = schedule.populate_class_id, other.populate_class_id
+            return bool(first.start_date and second.start_date and first.end_date and second.end_date) \
+                and (first.end_date < second.start_date or second.end_date < first.start_date)
+
+        messages = []
+        weekdays = dict(self.env['wk.weekly.schedule']._fields['weekday']._description_selection(self.env))
+        for schedule, other, key in self._find_conflicts(schedules, entries, compatible):
+            day = weekdays.get(schedule.weekday)
+            names = {
+                'class_name': schedule.populate_class_id.name or '',
+                'other_name': other.populate_class_id.name or '',
+                'slot': schedule.timeslot_id.name,
+                'other_slot': other.timeslot_id.name,
+            }
+            if key[1] == 'location':
+                messages.append(_("%(location)s is booked by %(class_name)s and %(other_name)s on %(day)s (%(slot)s / %(other_slot)s).",
+                                  location=schedule.location_id.name, day=day, **names))
+            else:
+                teacher = self.env['hr.employee'].browse(key[2])
+                messages.append(_("%(teacher)s teaches %(class_name)s and %(other_name)s at the same time on %(day)s (%(slot)s / %(other_slot)s).",
+                                  teacher=teacher.name, day=day, **names))
+        return messages
+
+    @api.model
+    def get_timetable_conflicts(self, timetables):
+        """Return the conflict messages of the classes per date, location and teacher."""
+        timetables = timetables.filtered(
+            lambda t: t.class_date and t.start_time and t.end_time and t.state != 'cancel')
+        if not timetables:
+            return []
+        others = self.env['wk.class.timetable'].sudo().search([
+            ('class_date', 'in', list(set(timetables.mapped('class_date')))),
+            ('start_time', '!=', False),
+            ('end_time', '!=', False),
+            ('state', '!=', 'cancel'),
+        ])
+        entries = []
+        for timetable in others | timetables:
+            # the teacher of the timetable replaces the one of the class, the secondary ones stay
+            teachers = self._get_teachers(timetable.teacher_id, timetable.populate_class_id)
+            keys = [(timetable.class_date, 'teacher', teacher.id) for teacher in teachers]
+            if timetable.location_id:
+                keys.append((timetable.class_date, 'location', timetable.location_id.id))
+            entries.append((keys, timetable.start_time, timetable.end_time, timetable))
+
+        messages = []
+        for timetable, other, key in self._find_conflicts(timetables, entries):
+            if key[1] == 'location':
+                messages.append(_("%(location)s is booked by %(class_name)s and %(other_name)s on %(date)s.",
+                                  location=timetable.location_id.name, date=timetable.class_date,
+                                  class_name=timetable.name, other_name=other.name))
+            else:
+                teacher = self.env['hr.employee'].browse(key[2])
+                messages.append(_("%(teacher)s teaches %(class_name)s and %(other_name)s at the same time on %(date)s.",
+                                  teacher=teacher.name, date=timetable.class_date,
+                                  class_name=timetable.name, other_name=other.name))
+        return messages
+
+    @api.model
+    def check_weekly_schedules(self, schedules):
+        self._raise_conflicts(self.get_weekly_schedule_conflicts(schedules))
+
+    @api.model
+    def check_timetables(self, timetables):
+        self._raise_conflicts(self.get_timetable_conflicts(timetables))
@@ -101,7 +101,11 @@ class StudentAttendance(models.Model):
 class StudentPublicHolidays(models.Model):
 
     _name = 'wk.student.public.holidays'
+    _inherit = 'wk.company.visibility.mixin'
     _description = 'Student Public Holidays'
 
     name = fields.Char(string='Title', required=True)
     date = fields.Date(string='Holiday Date', required=True)
+    company_id = fields.Many2one(
+        'res.company', string="School",
+        help="Leave empty for a holiday shared by all the schools.")
@@ -7,9 +7,9 @@
 #
 #################################################################################
 
-from odoo.http import request
-from odoo import models, fields, api, _
+from odoo import models, fields, api, _, Command
 from odoo.exceptions import ValidationError, UserError
+from datetime import date
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -52,6 +52,8 @@ class WkStudentScholarship(models.Model):
                                   domain="[('is_teacher','=',True)]", readonly=True)
     currency_id = fields.Many2one(
         string='Currency', related='company_id.currency_id', tracking=True)
+    reconciled_slip_ids = fields.Many2many('wk.fee.slip', string="Reconciled Fee Slips",
+                                           readonly=True, copy=False)
 
     @api.model_create_multi
     def create(self, vals_list):
@@ -94,16 +96,19 @@ class WkStudentScholarship(models.Model):
         for scholarship in self:
             scholarship.state = 'new'
 
+    def _get_scholarship_product(self):
+        scholarship_product = self.env['ir.default'].sudo()._get('res.config.settings', 'scholarship_product_id')
+        if not scholarship_product:
+            raise UserError(
+                _("There is no element selected for scholarship.Please select one in configuration."))
+        return scholarship_product
+
     def generate_in_invoice(self):
         self.ensure_one()
-        scholarship_product = request.env['res.config.settings'].sudo().get_values().get('scholarship_product_id')
         if not self.student_id.user_id.partner_id:
             raise UserError(
                 _("The student does not have a valid associated customer record."))
-
-        if not scholarship_product:
-            raise UserError(
-                _("There is no element selected for scholarship.Please select one in configuration."))
+        scholarship_product = self._get_scholarship_product()
 
         invoice_vals = {
             'move_type': 'in_invoice',
@@ -121,6 +126,95 @@ class WkStudentScholarship(models.Model):
         invoice.action_post()
         self.invoice_id = invoice.id
 
+    def _has_unused_credit(self):
+        """Whether the scholarship still has an approved credit to net against fee slips."""
+        self.ensure_one()
+        if not self.invoice_id:
+            return True
+        return self.invoice_id.move_type == 'out_refund' and self.invoice_id.state == 'posted' \
+            and self.invoice_id.payment_state in ('not_paid', 'partial')
+
+    def action_reconcile_fee_slips(self):
+        """Net the approved scholarships against the open fee slips of their enrollment.
+
+        One credit note per new scholarship is created and posted in a single
+        batch, then reconciled with the slip invoices in due date order, oldest
+        first. A credit note not fully used keeps the scholarship approved, so its
+        residual is netted against the next slips on a later run. Slips whose
+        invoice ends up fully covered are marked paid with a single write, so the
+        fee status of each enrollment is recomputed only once.
+        """
+        scholarships = self.filtered(
+            lambda s: s.state == 'approve' and s.enrollment_id
+            and s.student_id.user_id.partner_id and s._has_unused_credit())
+        if not scholarships:
+            return
+        open_slips = self.env['wk.fee.slip'].search([
+            ('enrollment_id', 'in', scholarships.enrollment_id.ids),
+            ('state', 'in', ('to_pay', 'overdue')),
+            ('invoice_id.state', '=', 'posted'),
+            ('invoice_id.payment_state', 'in', ('not_paid', 'partial')),
+        ])
+        slips_by_enrollment = {
+            enrollment: slips.sorted(lambda slip: (
+                slip.invoice_id.invoice_date_due or slip.invoice_id.invoice_date or date.max, slip.id))
+            for enrollment, slips in open_slips.grouped('enrollment_id').items()
+        }
+        scholarships = scholarships.filtered(lambda s: s.enrollment_id in slips_by_enrollment)
+
+        new_scholarships = scholarships.filtered(lambda s: not s.invoice_id)
+        today = fields.Date.today()
+        if new_scholarships:
+            scholarship_product = self._get_scholarship_product()
+            credit_notes = self.env['account.move'].create([{
+                'move_type': 'out_refund',
+                'partner_id': scholarship.student_id.user_id.partner_id.id,
+                'invoice_date': today,
+                'date': today,
+                'invoice_origin': scholarship.name,
+                'company_id': scholarship.company_id.id,
+                'invoice_line_ids': [Command.create({
+                    'product_id': scholarship_product,
+                    'quantity': 1,
+                    'price_unit': scholarship.scholarship_amount,
+                })],
+            } for scholarship in new_scholarships])
+            credit_notes.action_post()
+            for scholarship, credit_note in zip(new_scholarships, credit_notes):
+                scholarship.invoice_id = credit_note
+
+        def receivable(move):
+            return move.line_ids.filtered(
+                lambda l: l.account_id.account_type == 'asset_receivable' and not l.reconciled)
+
+        for scholarship in scholarships:
+            credit_note = scholarship.invoice_id
+            reconciled_slips = self.env['wk.fee.slip']
+            for slip in slips_by_enrollment[scholarship.enrollment_id]:
+                credit_lines = receivable(credit_note)
+                if not credit_lines:
+                    break
+                invoice_lines = receivable(slip.invoice_id)
+                if not invoice_lines:
+                    continue
+                (credit_lines | invoice_lines).reconcile()
+                reconciled_slips |= slip
+            scholarship_vals = {'reconciled_slip_ids': [Command.link(slip.id) for slip in reconciled_slips]}
+            if credit_note.payment_state == 'paid':
+                scholarship_vals.update(state='paid', paid_date=today)
+            scholarship.write(scholarship_vals)
+
+        open_slips.filtered(lambda s: s.invoice_id.payment_state == 'paid').write({'state': 'paid'})
+
+    def scholarship_reconcile(self):
+        scholarships = self.search([
+            ('state', '=', 'approve'),
+            '|', ('invoice_id', '=', False),
+            '&', ('invoice_id.move_type', '=', 'out_refund'),
+            ('invoice_id.payment_state', 'in', ('not_paid', 'partial')),
+        ])
+        scholarships.action_reconcile_fee_slips()
+
     def action_scholarship_paid(self):
         return {
             'type': 'ir.actions.act_window',
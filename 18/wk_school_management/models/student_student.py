@@ -11,8 +11,10 @@ import logging
 import re
 from random import choice
 from string import digits
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import ValidationError, UserError
+from odoo.tools import SQL
+import pytz
 
 _logger = logging.getLogger(__name__)
 
@@ -29,7 +31,8 @@ class StudentDocumentType(models.Model):
 class StudentStudent(models.Model):
 
     _name = 'student.student'
-    _inherit = ['mail.thread', 'mail.activity.mixin', 'wk.company.visibility.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'wk.company.visibility.mixin',
+                'wk.timetable.calendar.mixin']
     _description = 'Student Details'
     _order = "create_date desc"
 
@@ -81,6 +84,11 @@ class StudentStudent(models.Model):
     route_id = fields.Many2one('transport.route', string='Transport Route', help="The transport route assigned to the student.")
     location_id = fields.Many2one('transport.location', string='Transport Location', help="The transport location associated with the student.")
 
+    _calendar_feed_kind = 'student'
+
+    def _get_calendar_timetable_domain(self):
+        return [('student_index_ids', 'in', self.ids)]
+
     @api.constrains('email')
     def _check_email_format(self):
         email_regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -353,6 +361,101 @@ class StudentStudent(models.Model):
                 'route_id': False
             })
             
+    def _get_transport_stop(self):
+        self.ensure_one()
+        if not (self.route_id and self.location_id):
+            return self.env['transport.route.stop']
+        return self.env['transport.route.stop'].search(
+            [('route_id', '=', self.route_id.id), ('location_id', '=', self.location_id.id)], limit=1)
+
+    def get_transport_feed_version(self, day, tz):
+        """Return a key changing with the day, the language and every record shown in the feed."""
+        self.ensure_one()
+        for model in ('student.student', 'transport.route', 'transport.route.stop', 'transport.location',
+                      'transport.trip', 'transport.trip.line', 'fleet.vehicle', 'res.users', 'res.partner'):
+            self.env[model].flush_model()
+        self.env.cr.execute(SQL(
+            """SELECT student.write_date, route.write_date, stop.write_date, location.write_date,
+                      vehicle.write_date, driver.write_date, manager.write_date, manager_partner.write_date,
+                      trip.write_date, line.write_date
+                 FROM student_student student
+                 LEFT JOIN transport_route route ON route.id = student.route_id
+                 LEFT JOIN transport_route_stop stop
+                        ON stop.route_id = student.route_id AND stop.location_id = student.location_id
+                 LEFT JOIN transport_location location ON location.id = stop.location_id
+                 LEFT JOIN fleet_vehicle vehicle ON vehicle.id = route.vehicle_id
+                 LEFT JOIN res_partner driver ON driver.id = vehicle.driver_id
+                 LEFT JOIN res_users manager ON manager.id = route.transport_manager_id
+                 LEFT JOIN res_partner manager_partner ON manager_partner.id = manager.partner_id
+                 LEFT JOIN transport_trip trip ON trip.route_id = student.route_id AND trip.trip_date = %(day)s
+                 LEFT JOIN transport_trip_line line ON line.trip_id = trip.id AND line.student_id = student.id
+                WHERE student.id = %(student_id)s
+                LIMIT 1""", day=day, student_id=self.id))
+        return "-".join([str(self.id), str(day), tz, self.env.lang or ''] +
+                        [str(value) for value in self.env.cr.fetchone() or ()])
+
+    def get_transport_feed(self, tz=None):
+        """Return the (feed, version) of today's transport of the student, built once per version."""
+        self.ensure_one()
+        tz = tz or self.env.user.tz or 'UTC'
+        day = fields.Date.context_today(self.with_context(tz=tz))
+        version = self.get_transport_feed_version(day, tz)
+        return self._render_transport_feed(version, day, tz), version
+
+    @tools.ormcache('self.id', 'self.env.lang', 'version')
+    def _render_transport_feed(self, version, day, tz):
+        route = self.route_id
+        stop = self._get_transport_stop()
+        line = self.env['transport.trip.line'].search([
+            ('student_id', '=', self.id),
+            ('trip_id.route_id', '=', route.id),
+            ('trip_id.trip_date', '=', day),
+        ], limit=1) if route else self.env['transport.trip.line']
+        local_tz = pytz.timezone(tz)
+
+        def local_time(value):
+            return pytz.utc.localize(value).astimezone(local_tz).strftime('%I:%M %p') if value else False
+
+        trip = line.trip_id
+        states = dict(self.env['transport.trip']._fields['state']._description_selection(self.env))
+        return {
+            'date': fields.Date.to_string(day),
+            'route': {
+                'name': route.name,
+                'state': route.state,
+                'vehicle': route.vehicle_id.license_plate or '',
+                'driver_phone': route.driver_phone or '',
+                'manager': route.transport_manager_id.name or '',
+            } if route else False,
+            'stop': {
+                'location': stop.location_id.name,
+                'pickup_time': stop.float_to_time_format(stop.pickup_time),
+                'dropoff_time': stop.float_to_time_format(stop.dropoff_time),
+            } if stop else False,
+            'trip': {
+                'name': trip.name,
+                'state': trip.state,
+                'state_label': states.get(trip.state),
+                'picked_up': line.picked_up,
+                'pickup_time': local_time(line.pickup_time),
+                'dropped_off': line.dropped_off,
+                'dropoff_time': local_time(line.dropoff_time),
+            } if trip else False,
+        }
+
+    def action_auto_assign_transport(self):
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Assign Routes by Location'),
+            'res_model': 'student.route.wizard',
+            'view_mode': 'form',
+            'view_id': self.env.ref('wk_school_management.student_route_wizard_view_form_auto_assign').id,
+            'target': 'new',
+            'context': {
+                'default_student_ids': self.ids,
+            },
+        }
+
     def action_activate_transport_bulk(self):
         if any(student.is_transport_enabled for student in self):
             raise UserError("Transposrt for some student is already enabled So please select students whose Transport is not enabled.")
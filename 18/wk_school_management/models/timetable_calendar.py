@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+#################################################################################
+#
+# Copyright (c) 2016-Present Webkul Software Pvt. Ltd. (<https://webkul.com/>; )
+# See LICENSE file for full copyright and licensing details.
+# License URL : <https://store.webkul.com/license.html/>;
+#
+#################################################################################
+
+from odoo import models, fields, api, tools, _
+from datetime import date, timedelta
+import uuid
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def _ics_escape(value):
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _ics_fold(line):
+    """Split a content line in chunks of 75 octets as required by RFC 5545."""
+    chunks = []
+    encoded = line.encode()
+    while len(encoded) > 75:
+        cut = 75 if not chunks else 74
+        while cut and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        chunks.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+    chunks.append(encoded.decode())
+    return "\r\n ".join(chunks)
+
+
+class TimetableCalendarMixin(models.AbstractModel):
+
+    _name = 'wk.timetable.calendar.mixin'
+    _description = 'Timetable Calendar Subscription'
+
+    _calendar_feed_kind = None
+    _calendar_days_before = 30
+    _calendar_days_after = 120
+
+    calendar_token = fields.Char(string="Calendar Token", copy=False, groups="base.group_user")
+    calendar_url = fields.Char(string="Calendar Subscription", compute='_compute_calendar_url',
+                               groups="base.group_user")
+
+    @api.depends('calendar_token')
+    def _compute_calendar_url(self):
+        base_url = self.get_base_url()
+        for record in self:
+            record.calendar_url = record.calendar_token and \
+                f"{base_url}/school/calendar/{record._calendar_feed_kind}/{record.id}/{record.calendar_token}.ics"
+
+    def action_reset_calendar_token(self):
+        for record in self:
+            record.calendar_token = str(uuid.uuid4())
+
+    def _get_calendar_url(self):
+        self.ensure_one()
+        if not self.calendar_token:
+            self.action_reset_calendar_token()
+        return self.calendar_url
+
+    def _get_calendar_timetable_domain(self):
+        return []
+
+    def _get_calendar_holiday_domain(self, start_date, end_date):
+        return [('date', '>=', start_date), ('date', '<=', end_date),
+                ('company_id', 'in', [False, self.company_id.id])]
+
+    def _get_calendar_window(self):
+        today = date.today()
+        return today - timedelta(days=self._calendar_days_before), today + timedelta(days=self._calendar_days_after)
+
+    def get_calendar_version(self):
+        """Return a key changing whenever a class or holiday of the calendar window changes."""
+        self.ensure_one()
+        start_date, end_date = self._get_calendar_window()
+        Timetable = self.env['wk.class.timetable'].sudo()
+        Holiday = self.env['wk.student.public.holidays'].sudo()
+        Timetable.flush_model()
+        Holiday.flush_model()
+        version = [self._name, str(self.id), str(start_date), self.env.lang or '']
+        for model, domain in (
+            (Timetable, self._get_calendar_timetable_domain() + [
+                ('class_date', '>=', start_date), ('class_date', '<=', end_date)]),
+            (Holiday, self._get_calendar_holiday_domain(start_date, end_date)),
+        ):
+            query = model._search(domain)
+            self.env.cr.execute(query.select('COUNT(*)', f'MAX("{model._table}"."write_date")'))
+            version += [str(value) for value in self.env.cr.fetchone()]
+        return "-".join(version)
+
+    def get_calendar_ics(self):
+        """Return the (ics, version) of the record, rendered again only when its version changed."""
+        self.ensure_one()
+        version = self.get_calendar_version()
+        return self._render_calendar_ics(version), version
+
+    @tools.ormcache('self._name', 'self.id', 'self.env.lang', 'version')
+    def _render_calendar_ics(self, version):
+        start_date, end_date = self._get_calendar_window()
+        domain = self._get_calendar_timetable_domain() + [
+            ('class_date', '>=', start_date), ('class_date', '<=', end_date),
+            ('start_time', '!=', False), ('end_time', '!=', False), ('state', '!=', 'cancel')]
+        timetables = self.env['wk.class.timetable'].sudo().search_read(
+            domain, ['name', 'start_time', 'end_time', 'write_date', 'state', 'subject_id', 'location_id'],
+            order='start_time')
+        holidays = self.env['wk.student.public.holidays'].sudo().search_read(
+            self._get_calendar_holiday_domain(start_date, end_date), ['name', 'date', 'write_date'])
+
+        dbname = self.env.cr.dbname
+        utc_format = '%Y%m%dT%H%M%SZ'
+        lines = [
+            'BEGIN:VCALENDAR',
+            'VERSION:2.0',
+            'PRODID:-//Webkul//School Management//EN',
+            'CALSCALE:GREGORIAN',
+            'METHOD:PUBLISH',
+            'X-WR-CALNAME:' + _ics_escape(_("%s Timetable", self.display_name)),
+        ]
+        for timetable in timetables:
+            location = timetable['location_id'] and timetable['location_id'][1] or ''
+            subject = timetable['subject_id'] and timetable['subject_id'][1] or timetable['name']
+            lines += [
+                'BEGIN:VEVENT',
+                f"UID:wk-class-timetable-{timetable['id']}@{dbname}",
+                'DTSTAMP:' + timetable['write_date'].strftime(utc_format),
+                'DTSTART:' + timetable['start_time'].strftime(utc_format),
+                'DTEND:' + timetable['end_time'].strftime(utc_format),
+                'SUMMARY:' + _ics_escape(f"{subject} ({location})" if location else subject),
+                'LOCATION:' + _ics_escape(location),
+                'DESCRIPTION:' + _ics_escape(timetable['name']),
+                'STATUS:CONFIRMED',
+                'END:VEVENT',
+            ]
+        for holiday in holidays:
+            lines += [
+                'BEGIN:VEVENT',
+                f"UID:wk-public-holiday-{holiday['id']}@{dbname}",
+                'DTSTAMP:' + holiday['write_date'].strftime(utc_format),
+                'DTSTART;VALUE=DATE:' + holiday['date'].strftime('%Y%m%d'),
+                'DTEND;VALUE=DATE:' + (holiday['date'] + timedelta(days=1)).strftime('%Y%m%d'),
+                'SUMMARY:' + _ics_escape(holiday['name']),
+                'TRANSP:TRANSPARENT',
+                'END:VEVENT',
+            ]
+        lines.append('END:VCALENDAR')
+        return "\r\n".join(_ics_fold(line) for line in lines) + "\r\n"
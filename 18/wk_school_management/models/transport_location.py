@@ -27,6 +27,8 @@ class TransportLocation(models.Model):
     state_id = fields.Many2one('res.country.state', string='State', required=True, help="State of the transport location", ondelete='restrict', domain="[('country_id', '=?', country_id)]")
     country_id = fields.Many2one('res.country', string='Country', required=True, help="Country of the transport location", ondelete='restrict')
     company_id = fields.Many2one('res.company', string='School', default=lambda self: self.env.company, help="School associated with this transport location", required=True)
+    latitude = fields.Float(string='Latitude', digits=(10, 7), help="Latitude of the transport location, used to optimize the routes")
+    longitude = fields.Float(string='Longitude', digits=(10, 7), help="Longitude of the transport location, used to optimize the routes")
     
     @api.onchange('country_id')
     def _onchange_country_id(self):
@@ -36,4 +38,25 @@ class TransportLocation(models.Model):
     @api.onchange('state_id')
     def _onchange_state(self):
         if self.state_id.country_id and self.country_id != self.state_id.country_id:
-            self.country_id = self.state_id.country_id
\ No newline at end of file
+            self.country_id = self.state_id.country_id
+
+    def _get_coordinates(self):
+        self.ensure_one()
+        return (self.latitude, self.longitude) if self.latitude or self.longitude else None
+
+    def action_geolocalize(self):
+        """Fill the coordinates from the address, falling back on the city when the street is unknown."""
+        Geocoder = self.env['base.geocoder']
+        for location in self:
+            country = location.country_id.name
+            result = Geocoder.geo_find(Geocoder.geo_query_address(
+                street=location.street, zip=location.zip, city=location.city,
+                state=location.state_id.name, country=country), force_country=country)
+            if result is None:
+                result = Geocoder.geo_find(Geocoder.geo_query_address(
+                    city=location.city, state=location.state_id.name, country=country), force_country=country)
+            if result:
+                location.write({'latitude': result[0], 'longitude': result[1]})
+            else:
+                _logger.info("No coordinates found for the transport location %s", location.name)
+        return True
@@ -10,6 +10,10 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
 from odoo.addons.resource.models.utils import float_to_time
+from odoo.tools import SQL
+from .route_optimizer import RouteOptimizer, haversine
+from collections import defaultdict
+import heapq
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -32,28 +36,138 @@ class TransportRoute(models.Model):
     
     student_ids = fields.One2many('student.student', 'route_id', string='Students', help="Students assigned to this transport route")
     trip_ids = fields.One2many('transport.trip', 'route_id', string='Trips', help="Trips associated with this transport route")
-    trip_count = fields.Integer(string='Trip Count', compute='_compute_trip_count', help="Number of trips associated with this transport route")
+    trip_count = fields.Integer(string='Trip Count', compute='_compute_route_counters', store=True, help="Number of trips associated with this transport route")
     route_stop_ids = fields.One2many('transport.route.stop', 'route_id', string='Route Stops', help="Stops associated with this transport route")
     state = fields.Selection([('draft', 'Draft'),
                               ('active', 'Active'),
                               ('inactive', 'Inactive')], string='Status', default='draft', help="Current status of the transport route")
     company_id = fields.Many2one('res.company', string='School', default=lambda self: self.env.company, help="School associated with this transport route")
     student_capacity = fields.Integer(string='Student Capacity', help="Maximum number of students that can be accommodated in this transport route")
-    enrolled_students = fields.Integer(string='Enrolled Students', compute='_compute_enrolled_students', help="Number of students currently enrolled in this transport route")
-    remaining_capacity = fields.Integer(string='Remaining Capacity', compute='_compute_remaining_capacity', help="Remaining capacity for students in this transport route")
-    has_running_trip = fields.Boolean(string='Has Running Trip', compute='_compute_has_running_trip', help="Indicates if there is an ongoing trip for this route")
+    enrolled_students = fields.Integer(string='Enrolled Students', compute='_compute_route_counters', store=True, help="Number of students currently enrolled in this transport route")
+    remaining_capacity = fields.Integer(string='Remaining Capacity', compute='_compute_route_counters', store=True, help="Remaining capacity for students in this transport route")
+    has_running_trip = fields.Boolean(string='Has Running Trip', compute='_compute_route_counters', store=True, help="Indicates if there is an ongoing trip for this route")
+    average_speed = fields.Float(string='Average Speed (km/h)', default=25.0, help="Average speed of the vehicle, used to estimate the pickup and dropoff times")
+    stop_duration = fields.Float(string='Stop Duration (min)', default=1.0, help="Time spent at every stop to pick up or drop off the students")
+    pickup_start_time = fields.Float(string='First Pickup Time', default=7.0, help="Time of the first pickup of the morning trip")
+    dropoff_start_time = fields.Float(string='School Departure Time', default=14.0, help="Time at which the bus leaves the school for the dropoff trip")
+    route_distance = fields.Float(string='Route Distance (km)', digits=(16, 2), readonly=True, copy=False, help="Distance between the school and the farthest stop along the optimized route")
     
-    def _compute_trip_count(self):
-        for route in self:
-            route.trip_count = len(route.trip_ids)
-    
-    def _compute_enrolled_students(self):
-        for route in self:
-            route.enrolled_students = len(route.student_ids)
-    
-    def _compute_remaining_capacity(self):
+    @api.depends('student_ids', 'student_ids.active', 'student_capacity', 'trip_ids', 'trip_ids.state')
+    def _compute_route_counters(self):
+        """Count the students and trips of the saved routes with two grouped queries."""
+        saved = self.filtered(lambda route: isinstance(route.id, int))
+        students, trips, running = {}, {}, {}
+        if saved:
+            for route, count in self.env['student.student']._read_group(
+                    [('route_id', 'in', saved.ids)], ['route_id'], ['__count']):
+                students[route.id] = count
+            for route, state, count in self.env['transport.trip']._read_group(
+                    [('route_id', 'in', saved.ids)], ['route_id', 'state'], ['__count']):
+                trips[route.id] = trips.get(route.id, 0) + count
+                if state in ('new', 'progress'):
+                    running[route.id] = True
+        for route in self - saved:
+            students[route.id] = len(route.student_ids)
+            trips[route.id] = len(route.trip_ids)
+            running[route.id] = any(trip.state in ('new', 'progress') for trip in route.trip_ids)
         for route in self:
+            route.enrolled_students = students.get(route.id, 0)
             route.remaining_capacity = route.student_capacity - route.enrolled_students if route.student_capacity else 0
+            route.trip_count = trips.get(route.id, 0)
+            route.has_running_trip = running.get(route.id, False)
+
+    def _reserve_capacity(self, students, leaving=None):
+        """Lock the route and check it has a seat for every student not on it yet.
+
+        The row lock serializes the concurrent assignments to the route: the
+        enrolled students counter being stored on the route, a transaction
+        waiting for the lock fails on serialization and is retried with the
+        up to date counter instead of oversubscribing the route. The students
+        of ``leaving`` moving off the route in the same batch free their seats.
+        """
+        self.ensure_one()
+        self.flush_recordset(['student_capacity', 'enrolled_students'])
+        self.env.cr.execute(SQL(
+            "SELECT student_capacity, enrolled_students FROM transport_route WHERE id = %s FOR UPDATE", self.id))
+        capacity, enrolled = self.env.cr.fetchone()
+        newcomers = students.filtered(lambda student: student.route_id != self)
+        departures = (leaving or self.env['student.student']).filtered(lambda student: student.route_id == self)
+        if (enrolled or 0) + len(newcomers) - len(departures - students) > (capacity or 0):
+            raise UserError(_("The route %(route)s has %(seats)s seat(s) left for %(count)s student(s). Please select a different route or reduce the number of students.",
+                              route=self.name, seats=max((capacity or 0) - (enrolled or 0), 0), count=len(newcomers)))
+        return newcomers
+
+    @api.model
+    def assign_students_by_location(self, students, location=None):
+        """Assign the students to the active routes stopping at their location.
+
+        The students are grouped by location (``location`` when given, their
+        own one otherwise), the routes stopping at these locations are found
+        and locked with one query on the route stops, then filled up to their
+        capacity, the most constrained locations first. The assignments are
+        written with one ``write`` per route and location.
+        Returns the placement of every student as a list of dicts with the
+        student, location, route and a status among ``assigned``,
+        ``already_assigned``, ``no_location``, ``no_route`` and ``no_capacity``.
+        """
+        report = []
+        by_location = defaultdict(lambda: self.env['student.student'])
+        for student in students:
+            target = location or student.location_id
+            if target:
+                by_location[target] |= student
+            else:
+                report.append({'student_id': student.id, 'location_id': False, 'route_id': False, 'status': 'no_location'})
+        if not by_location:
+            return report
+
+        self.flush_model(['state', 'company_id', 'student_capacity', 'enrolled_students'])
+        self.env['transport.route.stop'].flush_model(['route_id', 'location_id'])
+        self.env.cr.execute(SQL(
+            """SELECT stop.location_id, route.id, route.student_capacity - route.enrolled_students
+                 FROM transport_route_stop stop
+                 JOIN transport_route route ON route.id = stop.route_id
+                WHERE stop.location_id IN %s
+                  AND route.state = 'active'
+                  AND route.company_id IN %s
+             ORDER BY route.id
+                  FOR UPDATE OF route""",
+            tuple(target.id for target in by_location),
+            tuple(set(students.company_id.ids)) or (0,)))
+        candidates = defaultdict(list)
+        free = {}
+        for location_id, route_id, remaining in self.env.cr.fetchall():
+            candidates[location_id].append(route_id)
+            free[route_id] = max(remaining or 0, 0)
+
+        assignments = defaultdict(lambda: self.env['student.student'])
+        for target in sorted(by_location, key=lambda loc: sum(free[route_id] for route_id in candidates[loc.id])):
+            route_ids = candidates[target.id]
+            for student in by_location[target]:
+                placement = {'student_id': student.id, 'location_id': target.id, 'route_id': False}
+                if student.route_id.id in route_ids and student.location_id == target:
+                    placement.update(route_id=student.route_id.id, status='already_assigned')
+                elif not route_ids:
+                    placement['status'] = 'no_route'
+                else:
+                    route_id = max(route_ids, key=free.__getitem__)
+                    if not free[route_id]:
+                        placement['status'] = 'no_capacity'
+                    else:
+                        free[route_id] -= 1
+                        assignments[route_id, target.id] |= student
+                        placement.update(route_id=route_id, status='assigned')
+                report.append(placement)
+
+        for (route_id, location_id), route_students in assignments.items():
+            route_students.write({
+                'route_id': route_id,
+                'location_id': location_id,
+                'is_transport_enabled': True,
+            })
+        _logger.info("%s student(s) assigned to %s route(s)", sum(map(len, assignments.values())),
+                     len({route_id for route_id, _location_id in assignments}))
+        return report
 
     def action_confirm(self):
         for route in self:
@@ -61,10 +175,6 @@ class TransportRoute(models.Model):
                 raise UserError(_("Only routes in draft state can be confirmed."))
             route.state = 'active'
             
-    def _compute_has_running_trip(self):
-        for route in self:
-            route.has_running_trip = any(trip.state == 'new' or trip.state == 'progress' for trip in route.trip_ids)
-    
     @api.constrains('transport_manager_id', 'other_responsible_ids')
     def _check_unique_teacher_transport_manager(self):
         for rec in self:
@@ -213,6 +323,20 @@ class TransportRoute(models.Model):
             'context': context,
         }
     
+    def action_generate_trips(self):
+        today = fields.Date.context_today(self)
+        trips = self.env['transport.trip']._generate_trips(self, today)
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Trips Generated'),
+            'res_model': 'wk.message.wizard',
+            'views': [(self.env.ref('wk_school_management.wk_message_wizard_view_form_success').id, 'form')],
+            'target': 'new',
+            'context': {
+                'default_message': _("%s trip(s) have been generated for %s.", len(trips), today)
+            }
+        }
+
     def action_stop_trip(self):
         if self.has_running_trip:
             trip = self.trip_ids.filtered(lambda t: t.state == 'new' or t.state == 'progress')
@@ -236,6 +360,130 @@ class TransportRoute(models.Model):
         else:
             raise UserError(_("No running trip found for this route."))
 
+    def _get_school_coordinates(self):
+        self.ensure_one()
+        partner = self.company_id.partner_id
+        if not (partner.partner_latitude or partner.partner_longitude):
+            partner.sudo().geo_localize()
+        if not (partner.partner_latitude or partner.partner_longitude):
+            raise UserError(_("The address of the school %s could not be localized, please set its coordinates.", self.company_id.name))
+        return (partner.partner_latitude, partner.partner_longitude)
+
+    def _check_stop_coordinates(self):
+        locations = self.route_stop_ids.location_id
+        locations.filtered(lambda location: not location._get_coordinates()).action_geolocalize()
+        missing = locations.filtered(lambda location: not location._get_coordinates())
+        if missing:
+            raise UserError(_("The following locations could not be localized, please set their coordinates:\n%s",
+                              "\n".join(missing.mapped('name'))))
+
+    @api.model
+    def _clamp_time(self, value):
+        return min(value, 23.99)
+
+    def action_optimize_stops(self):
+        """Reorder the stops of the routes and estimate their pickup and dropoff times.
+
+        The dropoff trip is the shortest open path leaving the school found by
+        the route optimizer; the pickup trip drives the same path backwards,
+        starting with the farthest stop at the first pickup time.
+        """
+        self._check_stop_coordinates()
+        for route in self:
+            stops = route.route_stop_ids.filtered('location_id')
+            if not stops:
+                continue
+            points = [route._get_school_coordinates()] + [stop.location_id._get_coordinates() for stop in stops]
+            optimizer = RouteOptimizer(points)
+            path = optimizer.solve()
+            speed = route.average_speed if route.average_speed > 0 else 25.0
+            halt = route.stop_duration / 60.0
+
+            values = {index: {} for index in path[1:]}
+            clock = route.dropoff_start_time
+            for previous, index in zip(path, path[1:]):
+                clock += optimizer.matrix[previous][index] / speed
+                values[index]['dropoff_time'] = route._clamp_time(clock)
+                clock += halt
+
+            pickup_path = path[:0:-1]
+            clock = route.pickup_start_time
+            for position, index in enumerate(pickup_path):
+                if position:
+                    clock += halt + optimizer.matrix[pickup_path[position - 1]][index] / speed
+                values[index].update(sequence=(position + 1) * 10, pickup_time=route._clamp_time(clock))
+
+            for index, vals in values.items():
+                stops[index - 1].write(vals)
+            route.route_distance = optimizer.length(path)
+            _logger.info("Route %s optimized: %s stops, %.2f km", route.name, len(stops), route.route_distance)
+        return True
+
+    def _get_capacity_split_suggestions(self):
+        """Return the moves bringing the routes back under their student capacity.
+
+        Every student of an overloaded route may move to the nearest stop of
+        another active route of the school with free seats; the moves are taken
+        cheapest first, the cost being the distance between the current stop of
+        the student and the new one, until no route is over its capacity.
+        Returns a list of dicts with the student, routes, stop location and distance.
+        """
+        overloaded = self.filtered(lambda route: route.student_capacity and route.enrolled_students > route.student_capacity)
+        if not overloaded:
+            return []
+        targets = self.search([
+            ('state', '=', 'active'),
+            ('company_id', 'in', overloaded.company_id.ids),
+            ('student_capacity', '>', 0),
+        ]) - overloaded
+        targets._check_stop_coordinates()
+        excess = {route: route.enrolled_students - route.student_capacity for route in overloaded}
+        free = {route: route.remaining_capacity for route in targets if route.remaining_capacity > 0}
+        target_stops = {
+            route: [(stop.location_id, stop.location_id._get_coordinates()) for stop in route.route_stop_ids if stop.location_id]
+            for route in free
+        }
+
+        nearest_cache = {}
+        def nearest_stop(point, route):
+            key = (point, route.id)
+            if key not in nearest_cache:
+                nearest_cache[key] = min(((haversine(point, coordinates), location) for location, coordinates in target_stops[route]),
+                                         key=lambda item: item[0], default=None)
+            return nearest_cache[key]
+
+        candidates = []
+        for route in overloaded:
+            for student in route.student_ids:
+                point = student.location_id and student.location_id._get_coordinates()
+                if not point:
+                    continue
+                for target in free:
+                    if target.company_id != route.company_id:
+                        continue
+                    nearest = nearest_stop(point, target)
+                    if nearest:
+                        candidates.append((nearest[0], student.id, target.id, route, target, nearest[1], student))
+        heapq.heapify(candidates)
+
+        moves = []
+        moved = set()
+        while candidates and any(excess.values()):
+            distance, student_id, _target_id, route, target, location, student = heapq.heappop(candidates)
+            if student_id in moved or not excess[route] or not free[target]:
+                continue
+            moved.add(student_id)
+            excess[route] -= 1
+            free[target] -= 1
+            moves.append({
+                'student_id': student.id,
+                'from_route_id': route.id,
+                'to_route_id': target.id,
+                'location_id': location.id,
+                'distance': distance,
+            })
+        return moves
+
 
 class TransportRouteStop(models.Model):
     
@@ -9,11 +9,20 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
+from odoo.tools import SQL
+from collections import defaultdict
+from datetime import datetime
 import pytz
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# scan kind: (boolean field, time field) of the trip line
+SCAN_FIELDS = {
+    'pickup': ('picked_up', 'pickup_time'),
+    'dropoff': ('dropped_off', 'dropoff_time'),
+}
+
 class TransportTrip(models.Model):
     
     _name = 'transport.trip'
@@ -28,14 +37,14 @@ class TransportTrip(models.Model):
                               ('cancelled', 'Cancelled')], string='Trip Status', default='new', help="Current status of the trip", tracking=True)
     trip_date = fields.Date(string='Trip Date', help="Date of the trip")
     trip_line_ids = fields.One2many('transport.trip.line', 'trip_id', string='Trip Lines', help="Lines associated with this trip")
-    total_students = fields.Integer(string='Total Students', compute='_compute_total_students', help="Total number of students assigned to this trip", store=True)
-    total_pickup_present = fields.Integer(string='Pickup (Present)', compute='_compute_total_present', help="Total number of students present for pickup", store=True)
-    total_pickup_absent = fields.Integer(string='Pickup (Absent)', compute='_compute_total_absent', help="Total number of students absent for pickup", store=True)
-    total_dropoff_present = fields.Integer(string='Dropoff (Present)', compute='_compute_total_present', help="Total number of students present for dropoff", store=True)
-    total_dropoff_absent = fields.Integer(string='Dropoff (Absent)', compute='_compute_total_absent', help="Total number of students absent for dropoff", store=True)
+    total_students = fields.Integer(string='Total Students', compute='_compute_trip_totals', help="Total number of students assigned to this trip", store=True)
+    total_pickup_present = fields.Integer(string='Pickup (Present)', compute='_compute_trip_totals', help="Total number of students present for pickup", store=True)
+    total_pickup_absent = fields.Integer(string='Pickup (Absent)', compute='_compute_trip_totals', help="Total number of students absent for pickup", store=True)
+    total_dropoff_present = fields.Integer(string='Dropoff (Present)', compute='_compute_trip_totals', help="Total number of students present for dropoff", store=True)
+    total_dropoff_absent = fields.Integer(string='Dropoff (Absent)', compute='_compute_trip_totals', help="Total number of students absent for dropoff", store=True)
     company_id = fields.Many2one('res.company', string='School', related='route_id.company_id', help="School associated with this transport trip")
     remarks = fields.Text(string='Remarks', help="Any remarks related to this trip")
-    has_difference = fields.Boolean(string="Had difference in Pickup or Dropoff Attendance", compute="_compute_has_difference")
+    has_difference = fields.Boolean(string="Had difference in Pickup or Dropoff Attendance", compute="_compute_trip_totals", store=True)
     
     driver_id = fields.Many2one('res.partner', string='Driver', help="Driver associated with this trip", domain="['|', ('company_id', '=', company_id), ('company_id', '=', False)]")
     driver_phone = fields.Char(related='driver_id.phone', string='Driver Phone', help="Phone number of the driver")
@@ -53,12 +62,83 @@ class TransportTrip(models.Model):
     
     @api.model_create_multi
     def create(self, vals_list):
+        # reserve the names of the trips of a company with one sequence call
+        unnamed = defaultdict(list)
+        routes = self.env['transport.route'].browse({vals['route_id'] for vals in vals_list if vals.get('route_id')})
+        companies = {route.id: route.company_id for route in routes}
         for vals in vals_list:
             if vals.get('name', _("New")) == _("New"):
-                vals['name'] = self.env['ir.sequence'].next_by_code(
-                    'transport.trip.sequence') or _("New")
+                unnamed[companies.get(vals.get('route_id')) or self.env.company].append(vals)
+        for company, company_vals in unnamed.items():
+            names = self.env['ir.sequence'].with_company(company).next_batch_by_code(
+                'transport.trip.sequence', len(company_vals))
+            for vals, name in zip(company_vals, names):
+                vals['name'] = name or _("New")
         return super().create(vals_list)
+
+    @api.model
+    def _is_trip_day(self, date, company):
+        return date.weekday() != 6 and not self.env['wk.student.public.holidays'].sudo().search_count(
+            [('date', '=', date), ('company_id', 'in', [company.id, False])], limit=1)
+
+    @api.model
+    def _generate_trips(self, routes, date):
+        """Create the trips of the routes for the date, with a line per student of the route.
+
+        Routes already having a trip on that date are skipped, the trips are
+        created at once and all their lines with a single batched create.
+        """
+        routes = routes.filtered(lambda route: route.state == 'active')
+        if not routes:
+            return self.browse()
+        existing = self.search([('route_id', 'in', routes.ids), ('trip_date', '=', date)])
+        routes -= existing.route_id
+        students = self.env['student.student'].search([('route_id', 'in', routes.ids)])
+        students_by_route = students.grouped('route_id')
+        routes = routes.filtered(lambda route: route in students_by_route)
+        if not routes:
+            return self.browse()
+
+        trips = self.create([{
+            'route_id': route.id,
+            'trip_date': date,
+            'state': 'new',
+            'driver_id': route.driver_id.id,
+            'vehicle_id': route.vehicle_id.id,
+            'responsible_id': route.transport_manager_id.id,
+        } for route in routes])
+        stops = {(stop.route_id.id, stop.location_id.id): stop.id for stop in routes.route_stop_ids}
+        self.env['transport.trip.line'].create([{
+            'trip_id': trip.id,
+            'student_id': student.id,
+            'location_id': student.location_id.id,
+            'stop_id': stops.get((trip.route_id.id, student.location_id.id), False),
+        } for trip in trips for student in students_by_route[trip.route_id]])
+        _logger.info("%s transport trip(s) generated for %s", len(trips), date)
+        return trips
+
+    @api.model
+    def generate_daily_trips(self):
+        """Cron: create today's trips of every active route, except on Sundays and holidays.
+
+        Today and the holidays are those of each school, in its own timezone.
+        """
+        Timetable = self.env['wk.class.timetable']
+        for company in self.env['res.company'].search([]):
+            today = fields.Date.context_today(self.with_context(tz=Timetable._get_school_tz(company)))
+            if not self._is_trip_day(today, company):
+                continue
+            routes = self.env['transport.route'].with_company(company).search(
+                [('state', '=', 'active'), ('company_id', '=', company.id)])
+            self.with_company(company)._generate_trips(routes, today)
+        return True
     
+    def _get_local_date(self, moment):
+        """Return the date of a naive UTC datetime in the timezone of the school of the trip."""
+        self.ensure_one()
+        school_tz = pytz.timezone(self.env['wk.class.timetable']._get_school_tz(self.route_id.company_id))
+        return pytz.utc.localize(moment).astimezone(school_tz).date()
+
     @api.constrains('trip_date', 'trip_line_ids')
     def _check_trip_date_and_times(self):
         for trip in self:
@@ -66,7 +146,7 @@ class TransportTrip(models.Model):
                 continue
             for line in trip.trip_line_ids:
                 if line.pickup_time:
-                    pickup_date = fields.Date.to_date(line.pickup_time)
+                    pickup_date = trip._get_local_date(line.pickup_time)
                     if pickup_date != trip.trip_date:
                         raise UserError(
                             _("Pickup date (%s) for student '%s' does not match the trip date (%s).")
@@ -74,38 +154,51 @@ class TransportTrip(models.Model):
                         )
 
                 if line.dropoff_time:
-                    dropoff_date = fields.Date.to_date(line.dropoff_time)
+                    dropoff_date = trip._get_local_date(line.dropoff_time)
                     if dropoff_date != trip.trip_date:
                         raise UserError(
                             _("Drop-off date (%s) for student '%s' does not match the trip date (%s).")
                             % (dropoff_date, line.student_id.display_name or '', trip.trip_date)
                         )
     
-    @api.depends('trip_line_ids')
-    def _compute_total_students(self):
-        for trip in self:
-            trip.total_students = len(trip.trip_line_ids)
+    @api.depends('trip_line_ids', 'trip_line_ids.picked_up', 'trip_line_ids.dropped_off')
+    def _compute_trip_totals(self):
+        """Compute the counters and the difference flag of the trips in a single pass.
+
+        Saved trips are counted with one grouped query on their lines, the
+        trips being edited in a form are counted from their lines in cache.
+        """
+        saved = self.filtered(lambda trip: isinstance(trip.id, int))
+        totals = {}
+        if saved:
+            self.env['transport.trip.line'].flush_model(['trip_id', 'picked_up', 'dropped_off'])
+            self.env.cr.execute(SQL(
+                """SELECT trip_id, COUNT(*),
+                          COUNT(*) FILTER (WHERE picked_up),
+                          COUNT(*) FILTER (WHERE dropped_off),
+                          BOOL_OR(COALESCE(picked_up, FALSE) != COALESCE(dropped_off, FALSE))
+                     FROM transport_trip_line
+                    WHERE trip_id IN %s
+                 GROUP BY trip_id""", tuple(saved.ids)))
+            totals = {row[0]: row[1:] for row in self.env.cr.fetchall()}
+        for trip in self - saved:
+            total = picked = dropped = 0
+            difference = False
+            for line in trip.trip_line_ids:
+                total += 1
+                picked += line.picked_up
+                dropped += line.dropped_off
+                difference = difference or line.picked_up != line.dropped_off
+            totals[trip.id] = (total, picked, dropped, difference)
 
-    @api.depends('trip_line_ids')
-    def _compute_total_present(self):
-        for trip in self:
-            total_pickup_present = sum(1 for line in trip.trip_line_ids if line.picked_up )
-            trip.total_pickup_present = total_pickup_present
-            total_dropoff_present = sum(1 for line in trip.trip_line_ids if line.dropped_off)
-            trip.total_dropoff_present = total_dropoff_present
-    
-    @api.depends('trip_line_ids')
-    def _compute_total_absent(self):
-        for trip in self:
-            total_pickup_absent = sum(1 for line in trip.trip_line_ids if not line.picked_up)
-            trip.total_pickup_absent = total_pickup_absent
-            total_dropoff_absent = sum(1 for line in trip.trip_line_ids if not line.dropped_off)
-            trip.total_dropoff_absent = total_dropoff_absent
-    
-    @api.depends('trip_line_ids')
-    def _compute_has_difference(self):
         for trip in self:
-          trip.has_difference = any(trip.picked_up != trip.dropped_off for trip in trip.trip_line_ids)
+            total, picked, dropped, difference = totals.get(trip.id, (0, 0, 0, False))
+            trip.total_students = total
+            trip.total_pickup_present = picked
+            trip.total_pickup_absent = total - picked
+            trip.total_dropoff_present = dropped
+            trip.total_dropoff_absent = total - dropped
+            trip.has_difference = bool(difference)
           
     def _compute_other_responsible(self):
         for trip in self:
@@ -129,6 +222,97 @@ class TransportTrip(models.Model):
         
     def action_start_trip(self):
         self.state = 'progress'
+
+    def action_open_scanner(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/school_management/transport/scanner/{self.id}',
+            'target': 'self',
+        }
+
+    @api.model
+    def _parse_scan_time(self, value, now):
+        """Return the UTC datetime of a device timestamp (epoch milliseconds or string), never in the future."""
+        if isinstance(value, (int, float)):
+            moment = datetime.fromtimestamp(value / 1000.0, tz=pytz.utc).replace(tzinfo=None, microsecond=0)
+        else:
+            moment = fields.Datetime.to_datetime(value) if value else now
+        return min(moment, now)
+
+    def _get_scan_totals(self):
+        self.ensure_one()
+        return {
+            'state': self.state,
+            'total_students': self.total_students,
+            'total_pickup_present': self.total_pickup_present,
+            'total_pickup_absent': self.total_pickup_absent,
+            'total_dropoff_present': self.total_dropoff_present,
+            'total_dropoff_absent': self.total_dropoff_absent,
+        }
+
+    def apply_scans(self, scans):
+        """Mark the students of a batch of barcode scans as picked up or dropped off.
+
+        ``scans`` is a list of ``{'uid', 'barcode', 'kind', 'timestamp'}`` dicts,
+        ``kind`` being ``pickup`` or ``dropoff`` and ``timestamp`` the time of the
+        scan on the device. The lines are updated with one query per kind and
+        the totals of the trip computed once for the whole batch. Returns the
+        status of every scan and the new totals of the trip.
+        """
+        self.ensure_one()
+        if self.state not in ('new', 'progress'):
+            raise UserError(_("Only new or in-progress trips can be scanned."))
+        lines = {line.student_id.barcode: line for line in self.trip_line_ids if line.student_id.barcode}
+        now = fields.Datetime.now()
+        updates = {kind: {} for kind in SCAN_FIELDS}
+        results = []
+        for scan in scans:
+            kind = scan.get('kind')
+            line = lines.get(str(scan.get('barcode') or '').strip())
+            status = 'ok'
+            if kind not in SCAN_FIELDS:
+                status = 'invalid'
+            elif not line:
+                status = 'unknown'
+            else:
+                moment = self._parse_scan_time(scan.get('timestamp'), now)
+                if self.trip_date and self._get_local_date(moment) != self.trip_date:
+                    status = 'invalid_time'
+                elif line[SCAN_FIELDS[kind][0]]:
+                    status = 'duplicate'
+                elif line in updates[kind]:
+                    updates[kind][line] = min(updates[kind][line], moment)
+                    status = 'duplicate'
+                else:
+                    updates[kind][line] = moment
+            results.append({
+                'uid': scan.get('uid'),
+                'status': status,
+                'student': line.student_id.name if line else False,
+            })
+
+        TripLine = self.env['transport.trip.line']
+        TripLine.flush_model()
+        for kind, moments in updates.items():
+            if not moments:
+                continue
+            flag, time_field = SCAN_FIELDS[kind]
+            values = SQL(", ").join(SQL("(%s, %s::timestamp)", line.id, moment) for line, moment in moments.items())
+            self.env.cr.execute(SQL(
+                """UPDATE transport_trip_line AS line
+                      SET %(flag)s = TRUE, %(time_field)s = scan.moment,
+                          write_uid = %(uid)s, write_date = NOW() AT TIME ZONE 'UTC'
+                     FROM (VALUES %(values)s) AS scan(id, moment)
+                    WHERE line.id = scan.id""",
+                flag=SQL.identifier(flag), time_field=SQL.identifier(time_field),
+                uid=self.env.uid, values=values))
+            scanned = TripLine.browse([line.id for line in moments])
+            scanned.invalidate_recordset([flag, time_field, 'write_uid', 'write_date'])
+            scanned.modified([flag, time_field])
+        if updates['pickup'] and self.state == 'new':
+            self.state = 'progress'
+        return {'results': results, 'totals': self._get_scan_totals()}
     
     def action_trip_done(self):
         self.ensure_one()
@@ -8,7 +8,8 @@
 #################################################################################
 
 from odoo import models, fields, api, _
-from odoo.exceptions import UserError, ValidationError
+from odoo.exceptions import UserError
+from datetime import timedelta
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -34,28 +35,46 @@ class WeeklySchedule(models.Model):
         'wk.class.location', string="Location", required=True)
     populate_class_id = fields.Many2one('wk.school.class', string="Class")
 
-    @api.constrains('weekday', 'timeslot_id', 'location_id')
+    @api.constrains('weekday', 'timeslot_id', 'location_id', 'populate_class_id')
     def _check_timeslot_overlap(self):
-        for record in self:
-            overlapping_schedules = self.search([
-                ('id', '!=', record.id),
-                ('weekday', '=', record.weekday),
-                ('location_id', '=', record.location_id.id),
-                '|', '|',
-                '&', ('timeslot_id.start_time', '<=',
-                      record.timeslot_id.start_time),
-                ('timeslot_id.end_time', '>', record.timeslot_id.start_time),
-                '&', ('timeslot_id.start_time', '<',
-                      record.timeslot_id.end_time),
-                ('timeslot_id.end_time', '>=', record.timeslot_id.end_time),
-                '&', ('timeslot_id.start_time', '>=',
-                      record.timeslot_id.start_time),
-                ('timeslot_id.end_time', '<=', record.timeslot_id.end_time)
-            ])
+        self.env['wk.schedule.conflict'].check_weekly_schedules(self)
+
+    def _prepare_timetable_values(self, start_date, end_date, tz_name=None):
+        """Expand the weekly slots into the values of every class between the two dates.
 
-            if overlapping_schedules:
-                raise ValidationError(
-                    _(f'{record.location_id.name} is already booked for the selected period on {record.weekday} at {record.timeslot_id.name}.'))
+        Only the matching weekdays are visited and the class times are built from
+        the float timeslot hours in the school timezone, then stored in UTC.
+        """
+        Timetable = self.env['wk.class.timetable']
+        weekdays = [day for day, _label in self.DAYS]
+        vals_list = []
+        for schedule in self:
+            populate_class = schedule.populate_class_id
+            school_tz = tz_name or Timetable._get_school_tz(populate_class.company_id)
+            offset = (weekdays.index(schedule.weekday) - start_date.weekday()) % 7
+            class_date = start_date + timedelta(days=offset)
+            while class_date <= end_date:
+                name = str(populate_class.grade_id.name) + str(populate_class.title) + \
+                    '-' + str(populate_class.subject_id.name) + \
+                    '(' + str(class_date) + ')'
+                vals_list.append({
+                    'name': name,
+                    'grade_id': populate_class.grade_id.id,
+                    'subject_id': populate_class.subject_id.id,
+                    'location_id': schedule.location_id.id,
+                    'timeslot_id': schedule.timeslot_id.id,
+                    'session_id': populate_class.session_id.id,
+                    'term_id': populate_class.term_id.id,
+                    'class_date': class_date,
+                    'day': schedule.weekday,
+                    'teacher_id': populate_class.teacher_id.id,
+                    'populate_class_id': populate_class.id,
+                    'company_id': populate_class.company_id.id,
+                    'start_time': Timetable.get_slot_datetime(class_date, schedule.timeslot_id.start_time, school_tz),
+                    'end_time': Timetable.get_slot_datetime(class_date, schedule.timeslot_id.end_time, school_tz),
+                })
+                class_date += timedelta(days=7)
+        return vals_list
 
     def unlink(self):
         for record in self:
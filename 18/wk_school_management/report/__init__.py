@@ -7,4 +7,7 @@
 #
 #################################################################################
 
-from . import student_transcript
\ No newline at end of file
+from . import student_transcript
+from . import fee_aging_report
+from . import teaching_load_report
+from . import transport_usage_report
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#################################################################################
+#
+# Copyright (c) 2016-Present Webkul Software Pvt. Ltd. (<https://webkul.com/>; )
+# See LICENSE file for full copyright and licensing details.
+# License URL : <https://store.webkul.com/license.html/>;
+#
+#################################################################################
+from odoo import models, fields, tools
+
+
+class FeeAgingReport(models.Model):
+    _name = 'wk.fee.aging.report'
+    _description = 'Fee Aging Analysis'
+    _auto = False
+    _order = 'days_overdue desc'
+
+    fee_slip_id = fields.Many2one('wk.fee.slip', string="Fee Slip", readonly=True)
+    enrollment_id = fields.Many2one('student.enrollment', string="Enrollment No.", readonly=True)
+    student_id = fields.Many2one('student.student', string="Student", readonly=True)
+    grade_id = fields.Many2one('wk.school.grade', string="Grade", readonly=True)
+    section_id = fields.Many2one('wk.grade.section', string="Section", readonly=True)
+    academic_year_id = fields.Many2one('wk.academic.year', string="Academic Year", readonly=True)
+    company_id = fields.Many2one('res.company', string="School", readonly=True)
+    state = fields.Selection([
+        ('to_pay', 'To Pay'),
+        ('overdue', 'Overdue'),
+    ], string='Status', readonly=True)
+    date_to = fields.Date(string="Due Date", readonly=True)
+    days_overdue = fields.Integer(string="Days Overdue", readonly=True, aggregator='max')
+    aging_bucket = fields.Selection([
+        ('0_30', '0-30 Days'),
+        ('31_60', '31-60 Days'),
+        ('61_90', '61-90 Days'),
+        ('90_plus', '90+ Days'),
+    ], string="Aging", readonly=True)
+    amount_due = fields.Float(string="Amount Due", readonly=True)
+    amount_0_30 = fields.Float(string="0-30 Days", readonly=True)
+    amount_31_60 = fields.Float(string="31-60 Days", readonly=True)
+    amount_61_90 = fields.Float(string="61-90 Days", readonly=True)
+    amount_90_plus = fields.Float(string="90+ Days", readonly=True)
+
+    def _select(self):
+        return """
+            SELECT
+                slip.id AS id,
+                slip.id AS fee_slip_id,
+                slip.enrollment_id AS enrollment_id,
+                slip.student_id AS student_id,
+                slip.grade_id AS grade_id,
+                slip.section_id AS section_id,
+                slip.academic_year_id AS academic_year_id,
+                slip.company_id AS company_id,
+                slip.state AS state,
+                slip.date_to AS date_to,
+                aging.days AS days_overdue,
+                CASE
+                    WHEN aging.days <= 30 THEN '0_30'
+                    WHEN aging.days <= 60 THEN '31_60'
+                    WHEN aging.days <= 90 THEN '61_90'
+                    ELSE '90_plus'
+                END AS aging_bucket,
+                lines.amount AS amount_due,
+                CASE WHEN aging.days <= 30 THEN lines.amount ELSE 0 END AS amount_0_30,
+                CASE WHEN aging.days BETWEEN 31 AND 60 THEN lines.amount ELSE 0 END AS amount_31_60,
+                CASE WHEN aging.days BETWEEN 61 AND 90 THEN lines.amount ELSE 0 END AS amount_61_90,
+                CASE WHEN aging.days > 90 THEN lines.amount ELSE 0 END AS amount_90_plus
+        """
+
+    def _from(self):
+        return """
+            FROM wk_fee_slip slip
+            JOIN (
+                SELECT fee_slip_id, SUM(fee) AS amount
+                FROM wk_fee_slip_lines
+                GROUP BY fee_slip_id
+            ) lines ON lines.fee_slip_id = slip.id
+            CROSS JOIN LATERAL (
+                SELECT CURRENT_DATE - slip.date_to AS days
+            ) aging
+        """
+
+    def _where(self):
+        return """
+            WHERE slip.state IN ('to_pay', 'overdue')
+              AND slip.date_to <= CURRENT_DATE
+        """
+
+    def init(self):
+        # A plain view is always in sync with the slips, so no refresh is needed
+        # when their state changes.
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(f"""
+            CREATE OR REPLACE VIEW {self._table} AS (
+                {self._select()}
+                {self._from()}
+                {self._where()}
+            )
+        """)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#################################################################################
+#
+# Copyright (c) 2016-Present Webkul Software Pvt. Ltd. (<https://webkul.com/>; )
+# See LICENSE file for full copyright and licensing details.
+# License URL : <https://store.webkul.com/license.html/>;
+#
+#################################################################################
+from odoo import models, fields, api
+from odoo.tools import SQL
+from datetime import timedelta
+
+
+class TeachingLoadReport(models.Model):
+    _name = 'wk.teaching.load.report'
+    _description = 'Teacher Workload and Room Utilization'
+    _order = 'week_start desc, teacher_id'
+    _rec_name = 'teacher_id'
+
+    week_start = fields.Date(string="Week", readonly=True, index=True)
+    teacher_id = fields.Many2one('hr.employee', string="Teacher", readonly=True, index=True)
+    subject_id = fields.Many2one('wk.grade.subjects', string="Subject", readonly=True)
+    location_id = fields.Many2one('wk.class.location', string="Location", readonly=True, index=True)
+    company_id = fields.Many2one('res.company', string="School", readonly=True)
+    class_count = fields.Integer(string="Classes", readonly=True)
+    scheduled_hours = fields.Float(string="Scheduled Hours", readonly=True)
+    running_hours = fields.Float(string="Running Hours", readonly=True)
+    completed_hours = fields.Float(string="Completed Hours", readonly=True)
+    total_hours = fields.Float(string="Total Hours", readonly=True)
+
+    @api.model
+    def _get_bucket(self, timetable):
+        """Return the (week, teacher, subject, location, company) line of a class."""
+        if not timetable.class_date:
+            return None
+        week_start = timetable.class_date - timedelta(days=timetable.class_date.weekday())
+        return (week_start, timetable.teacher_id.id or 0, timetable.subject_id.id or 0,
+                timetable.location_id.id or 0, timetable.company_id.id or 0)
+
+    @api.model
+    def _refresh_buckets(self, buckets=None):
+        """Recompute the given lines from the classes, or every line when none is given.
+
+        Only the touched (week, teacher, subject, location, company) lines are
+        deleted and aggregated again, so a change on a few classes stays cheap.
+        """
+        if buckets is not None:
+            buckets = {bucket for bucket in buckets if bucket}
+            if not buckets:
+                return
+        self.env['wk.class.timetable'].flush_model()
+        self.env['wk.class.timeslot'].flush_model(['start_time', 'end_time'])
+        bucket_key = SQL(
+            "(date_trunc('week', t.class_date)::date, COALESCE(t.teacher_id, 0), COALESCE(t.subject_id, 0), "
+            "COALESCE(t.location_id, 0), COALESCE(t.company_id, 0))")
+        if buckets is None:
+            self.env.cr.execute(SQL("DELETE FROM %s", SQL.identifier(self._table)))
+            bucket_filter = SQL("TRUE")
+        else:
+            self.env.cr.execute(SQL(
+                """DELETE FROM %s
+                    WHERE (week_start, COALESCE(teacher_id, 0), COALESCE(subject_id, 0),
+                           COALESCE(location_id, 0), COALESCE(company_id, 0)) IN %s""",
+                SQL.identifier(self._table), tuple(buckets)))
+            bucket_filter = SQL("%s IN %s", bucket_key, tuple(buckets))
+
+        hours = SQL("COALESCE(s.end_time - s.start_time, EXTRACT(EPOCH FROM t.end_time - t.start_time) / 3600, 0)")
+        self.env.cr.execute(SQL(
+            """INSERT INTO %(table)s (week_start, teacher_id, subject_id, location_id, company_id,
+                                      class_count, scheduled_hours, running_hours, completed_hours,
+                                      total_hours, create_uid, create_date, write_uid, write_date)
+               SELECT date_trunc('week', t.class_date)::date, t.teacher_id, t.subject_id,
+                      t.location_id, t.company_id, COUNT(*),
+                      SUM(CASE WHEN t.state = 'draft' THEN %(hours)s ELSE 0 END),
+                      SUM(CASE WHEN t.state = 'running' THEN %(hours)s ELSE 0 END),
+                      SUM(CASE WHEN t.state = 'complete' THEN %(hours)s ELSE 0 END),
+                      SUM(%(hours)s), %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+                 FROM wk_class_timetable t
+                 LEFT JOIN wk_class_timeslot s ON s.id = t.timeslot_id
+                WHERE t.class_date IS NOT NULL
+                  AND t.state != 'cancel'
+                  AND %(filter)s
+                GROUP BY 1, 2, 3, 4, 5""",
+            table=SQL.identifier(self._table), hours=hours, uid=self.env.uid, filter=bucket_filter))
+        self.invalidate_model()
+
+    def init(self):
+        # Lines are kept up to date by the classes; rebuild them all on install/update.
+        self._refresh_buckets()
+
+    @api.model
+    def get_workload_data(self, group_by='teacher_id', date_from=None, date_to=None, company_ids=None):
+        """Return the hours grouped by teacher, subject, location or week as JSON rows."""
+        if group_by not in ('teacher_id', 'subject_id', 'location_id', 'week_start'):
+            group_by = 'teacher_id'
+        domain = []
+        if date_from:
+            domain.append(('week_start', '>=', fields.Date.to_date(date_from) - timedelta(days=6)))
+        if date_to:
+            domain.append(('week_start', '<=', date_to))
+        if company_ids:
+            domain.append(('company_id', 'in', company_ids))
+        groupby = f'{group_by}:week' if group_by == 'week_start' else group_by
+        aggregates = ['class_count:sum', 'scheduled_hours:sum', 'running_hours:sum',
+                      'completed_hours:sum', 'total_hours:sum']
+        rows = []
+        for group, *values in self._read_group(domain, [groupby], aggregates, order=groupby):
+            if group_by == 'week_start':
+                key, label = fields.Date.to_string(group), fields.Date.to_string(group)
+            else:
+                key, label = group.id, group.display_name
+            rows.append(dict(zip(['id', 'name'] + [aggregate.split(':')[0] for aggregate in aggregates],
+                                 [key, label] + values)))
+        return rows
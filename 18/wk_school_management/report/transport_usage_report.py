@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+#################################################################################
+#
+# Copyright (c) 2016-Present Webkul Software Pvt. Ltd. (<https://webkul.com/>; )
+# See LICENSE file for full copyright and licensing details.
+# License URL : <https://store.webkul.com/license.html/>;
+#
+#################################################################################
+from odoo import models, fields, api
+from odoo.tools import SQL
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+REFRESH_PARAM = 'wk_school_management.transport_usage_refreshed_at'
+# write_date is the start time of the writing transaction: the changes of the transactions
+# still running during a refresh are caught by the next one as long as they last less than this.
+REFRESH_OVERLAP = timedelta(hours=1)
+
+
+class TransportUsageReport(models.Model):
+    _name = 'wk.transport.usage.report'
+    _description = 'Transport Usage Analysis'
+    _order = 'trip_date desc, route_id, stop_id'
+    _rec_name = 'student_id'
+
+    trip_date = fields.Date(string="Date", readonly=True, index=True)
+    trip_id = fields.Many2one('transport.trip', string="Trip", readonly=True, index=True)
+    line_id = fields.Many2one('transport.trip.line', string="Trip Line", readonly=True, index=True)
+    route_id = fields.Many2one('transport.route', string="Route", readonly=True, index=True)
+    stop_id = fields.Many2one('transport.route.stop', string="Stop", readonly=True)
+    location_id = fields.Many2one('transport.location', string="Location", readonly=True)
+    student_id = fields.Many2one('student.student', string="Student", readonly=True, index=True)
+    company_id = fields.Many2one('res.company', string="School", readonly=True)
+    pickup_count = fields.Integer(string="Pickups", readonly=True)
+    dropoff_count = fields.Integer(string="Dropoffs", readonly=True)
+    no_show_count = fields.Integer(string="No-shows", readonly=True)
+    no_show_streak = fields.Integer(string="No-show Streak", readonly=True, aggregator='max',
+                                    help="Consecutive trips the student was not picked up, up to this one.")
+    pickup_deviation = fields.Float(string="Pickup Deviation (min)", readonly=True, aggregator='avg',
+                                    help="Minutes between the scheduled pickup time of the stop and the actual pickup, "
+                                         "positive when late.")
+    dropoff_deviation = fields.Float(string="Dropoff Deviation (min)", readonly=True, aggregator='avg',
+                                     help="Minutes between the scheduled dropoff time of the stop and the actual dropoff, "
+                                          "positive when late.")
+
+    @api.model
+    def _refresh_usage(self, full=False):
+        """Bring the facts up to date with the trips changed since the last refresh.
+
+        The facts of the changed or deleted trip lines are deleted and inserted
+        again, then the no-show streaks of the students involved are computed
+        once more over their history. The next refresh starts REFRESH_OVERLAP
+        before this one, rebuilding a trip twice being harmless.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        last_refresh = not full and ICP.get_param(REFRESH_PARAM)
+        self.env['transport.trip'].flush_model()
+        self.env['transport.trip.line'].flush_model()
+        self.env['transport.route.stop'].flush_model()
+        self.env.cr.execute("SELECT NOW() AT TIME ZONE 'UTC'")
+        refreshed_at = self.env.cr.fetchone()[0]
+
+        if last_refresh:
+            self.env.cr.execute(SQL(
+                """SELECT DISTINCT trip.id
+                     FROM transport_trip trip
+                     LEFT JOIN transport_trip_line line ON line.trip_id = trip.id
+                    WHERE trip.write_date >= %(since)s OR line.write_date >= %(since)s""",
+                since=last_refresh))
+            trip_ids = tuple(row[0] for row in self.env.cr.fetchall())
+            self.env.cr.execute(SQL(
+                """DELETE FROM %(table)s report
+                    WHERE report.trip_id IN %(trip_ids)s
+                       OR NOT EXISTS (SELECT 1 FROM transport_trip_line line WHERE line.id = report.line_id)
+                RETURNING report.student_id""",
+                table=SQL.identifier(self._table), trip_ids=trip_ids or (0,)))
+            trip_filter = SQL("trip.id IN %s", trip_ids or (0,))
+        else:
+            self.env.cr.execute(SQL("DELETE FROM %s RETURNING student_id", SQL.identifier(self._table)))
+            trip_filter = SQL("TRUE")
+        student_ids = {row[0] for row in self.env.cr.fetchall() if row[0]}
+
+        def deviation(column, scheduled):
+            # minutes between the local time of the scan and the scheduled float time of the stop
+            moment = SQL("(%s AT TIME ZONE 'UTC' AT TIME ZONE COALESCE(partner.tz, 'UTC'))", column)
+            return SQL(
+                "CASE WHEN %(moment)s IS NOT NULL AND %(scheduled)s > 0 "
+                "THEN (EXTRACT(EPOCH FROM %(moment)s::time) / 60 - %(scheduled)s * 60) END",
+                moment=moment, scheduled=scheduled)
+
+        self.env.cr.execute(SQL(
+            """INSERT INTO %(table)s (trip_date, trip_id, line_id, route_id, stop_id, location_id, student_id,
+                                      company_id, pickup_count, dropoff_count, no_show_count, no_show_streak,
+                                      pickup_deviation, dropoff_deviation,
+                                      create_uid, create_date, write_uid, write_date)
+               SELECT trip.trip_date, trip.id, line.id, trip.route_id, stop.id, line.location_id, line.student_id,
+                      route.company_id,
+                      CASE WHEN line.picked_up THEN 1 ELSE 0 END,
+                      CASE WHEN line.dropped_off THEN 1 ELSE 0 END,
+                      CASE WHEN line.picked_up THEN 0 ELSE 1 END,
+                      0, %(pickup_deviation)s, %(dropoff_deviation)s,
+                      %(uid)s, %(now)s, %(uid)s, %(now)s
+                 FROM transport_trip_line line
+                 JOIN transport_trip trip ON trip.id = line.trip_id
+                 JOIN transport_route route ON route.id = trip.route_id
+                 LEFT JOIN transport_route_stop stop
+                        ON stop.id = COALESCE(line.stop_id, (
+                               SELECT s.id FROM transport_route_stop s
+                                WHERE s.route_id = trip.route_id AND s.location_id = line.location_id
+                                LIMIT 1))
+                 LEFT JOIN res_company company ON company.id = route.company_id
+                 LEFT JOIN res_partner partner ON partner.id = company.partner_id
+                WHERE trip.trip_date IS NOT NULL
+                  AND trip.state IN ('progress', 'completed')
+                  AND line.student_id IS NOT NULL
+                  AND %(filter)s
+            RETURNING student_id""",
+            table=SQL.identifier(self._table), uid=self.env.uid, now=refreshed_at, filter=trip_filter,
+            pickup_deviation=deviation(SQL("line.pickup_time"), SQL("stop.pickup_time")),
+            dropoff_deviation=deviation(SQL("line.dropoff_time"), SQL("stop.dropoff_time"))))
+        student_ids.update(row[0] for row in self.env.cr.fetchall())
+
+        if student_ids:
+            # a pickup starts a new group: the streak counts the no-shows since the last pickup
+            self.env.cr.execute(SQL(
+                """UPDATE %(table)s report
+                      SET no_show_streak = streak.value
+                     FROM (SELECT id, SUM(no_show_count) OVER (
+                                      PARTITION BY student_id, pickup_group ORDER BY trip_date, id) AS value
+                             FROM (SELECT id, student_id, trip_date, no_show_count,
+                                          SUM(pickup_count) OVER (PARTITION BY student_id ORDER BY trip_date, id) AS pickup_group
+                                     FROM %(table)s
+                                    WHERE student_id IN %(student_ids)s) facts) streak
+                    WHERE report.id = streak.id
+                      AND report.no_show_streak IS DISTINCT FROM streak.value""",
+                table=SQL.identifier(self._table), student_ids=tuple(student_ids)))
+        ICP.set_param(REFRESH_PARAM, fields.Datetime.to_string(refreshed_at - REFRESH_OVERLAP))
+        self.invalidate_model()
+        _logger.info("Transport usage refreshed for %s student(s)", len(student_ids))
+        return True
+
+    def init(self):
+        # Rebuild all the facts on install/update, the cron keeps them up to date afterwards.
+        self._refresh_usage(full=True)
@@ -425,9 +425,7 @@ publicWidget.registry.student_timesheet = publicWidget.Widget.extend({
 
       var calendarEl = $('div#calendar')[0];
 
-      let timesheet_details = await this.rpc("/my/timesheet", {});
-
-      if (calendarEl && timesheet_details && timesheet_details['data']) {
+      if (calendarEl) {
         $(calendarEl).css({
           'max-width': '100%',
           'overflow-x': 'auto',
@@ -454,7 +452,7 @@ publicWidget.registry.student_timesheet = publicWidget.Widget.extend({
             if (!$(info.el).data('bs.popover')) {
               var href = "/my/timetables/" + info.event.id;
               var title = info.event.title ? info.event.title.split('-') : [''];
-              var props = info.event.extendedProps && info.event.extendedProps[0] ? info.event.extendedProps[0] : {};
+              var props = info.event.extendedProps || {};
               $(info.el).popover({
           html: true,
           trigger: 'focus',
@@ -481,7 +479,8 @@ publicWidget.registry.student_timesheet = publicWidget.Widget.extend({
             }
           },
           eventLimit: true,
-          events: timesheet_details['data'],
+          events: '/my/timetable/feed',
+          lazyFetching: true,
           datesSet: function() {
             // Use requestAnimationFrame for popover setup to avoid layout thrashing
             window.requestAnimationFrame(function() {
@@ -534,3 +533,28 @@ publicWidget.registry.student_timesheet = publicWidget.Widget.extend({
 
 })
 
+publicWidget.registry.student_transport_today = publicWidget.Widget.extend({
+    selector: '.o_transport_today',
+
+    start() {
+        // The feed answers 304 until the trip changes, so polling stays cheap
+        this.interval = setInterval(() => this.refresh(), 60000);
+        return this._super(...arguments);
+    },
+
+    destroy() {
+        clearInterval(this.interval);
+        this._super(...arguments);
+    },
+
+    async refresh() {
+        const response = await fetch(`/my/transport/feed?student_id=${this.el.dataset.studentId}`);
+        if (!response.ok) {
+            return;
+        }
+        const trip = (await response.json()).trip;
+        this.el.querySelector('.o_transport_today_state').textContent = trip ? trip.state_label : _t("No trip today");
+        this.el.querySelector('.o_transport_today_pickup').textContent = (trip && trip.pickup_time) || '-';
+        this.el.querySelector('.o_transport_today_dropoff').textContent = (trip && trip.dropoff_time) || '-';
+    },
+});
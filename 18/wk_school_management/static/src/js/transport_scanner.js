@@ -0,0 +1,136 @@
+/** @odoo-module **/
+
+import publicWidget from "@web/legacy/js/public/public_widget";
+import { _t } from "@web/core/l10n/translation";
+import { rpc, RPCError } from "@web/core/network/rpc";
+
+const BATCH_SIZE = 20;
+const FLUSH_DELAY = 3000;
+
+publicWidget.registry.transport_trip_scanner = publicWidget.Widget.extend({
+    selector: '.o_transport_scanner',
+    events: {
+        'keydown .o_scanner_input': 'on_keydown_scanner_input',
+    },
+
+    start() {
+        this.tripId = parseInt(this.el.dataset.tripId);
+        // Scans are kept on the device until the server acknowledged them
+        this.storageKey = `wk_transport_scans_${this.tripId}`;
+        this.queue = JSON.parse(localStorage.getItem(this.storageKey) || '[]');
+        this.flushing = false;
+        this.onOnline = () => this.flush();
+        window.addEventListener('online', this.onOnline);
+        this.interval = setInterval(() => this.flush(), FLUSH_DELAY);
+        this.render_pending();
+        this.flush();
+        return this._super(...arguments);
+    },
+
+    destroy() {
+        clearInterval(this.interval);
+        window.removeEventListener('online', this.onOnline);
+        this._super(...arguments);
+    },
+
+    on_keydown_scanner_input(ev) {
+        if (ev.key !== 'Enter') {
+            return;
+        }
+        ev.preventDefault();
+        const barcode = ev.currentTarget.value.trim();
+        ev.currentTarget.value = '';
+        if (!barcode) {
+            return;
+        }
+        this.queue.push({
+            uid: `${Date.now()}-${Math.random().toString(36).slice(2, 8)}`,
+            barcode: barcode,
+            kind: this.el.querySelector('input[name="scan_kind"]:checked').value,
+            timestamp: Date.now(),
+        });
+        this.save_queue();
+        if (this.queue.length >= BATCH_SIZE) {
+            this.flush();
+        }
+    },
+
+    save_queue() {
+        localStorage.setItem(this.storageKey, JSON.stringify(this.queue));
+        this.render_pending();
+    },
+
+    render_pending() {
+        this.el.querySelector('.o_scanner_pending').textContent = this.queue.length;
+    },
+
+    async flush() {
+        if (this.flushing || !this.queue.length || !navigator.onLine) {
+            return;
+        }
+        this.flushing = true;
+        const batch = this.queue.slice(0, BATCH_SIZE);
+        const status = this.el.querySelector('.o_scanner_status');
+        try {
+            const result = await rpc('/school_management/transport/scan', {
+                trip_id: this.tripId,
+                scans: batch,
+            });
+            this.drop_batch(batch);
+            this.render_result(result);
+            status.textContent = '';
+        } catch (error) {
+            if (error instanceof RPCError) {
+                // Rejected by the server (e.g. trip completed), retrying this batch would not help;
+                // it is listed as rejected and the scans queued after it are kept.
+                this.drop_batch(batch);
+                const message = error.data?.message || error.message;
+                this.render_rejected(batch, message);
+                status.textContent = message;
+            } else {
+                status.textContent = _t("Offline, scans will be sent later.");
+            }
+        } finally {
+            this.flushing = false;
+        }
+    },
+
+    drop_batch(batch) {
+        const sent = new Set(batch.map((scan) => scan.uid));
+        this.queue = this.queue.filter((scan) => !sent.has(scan.uid));
+        this.save_queue();
+    },
+
+    render_rejected(batch, message) {
+        const list = this.el.querySelector('.o_scanner_results');
+        for (const scan of batch) {
+            const item = document.createElement('li');
+            item.className = 'list-group-item list-group-item-danger';
+            item.textContent = `${scan.barcode} ${_t("Rejected")}: ${message}`;
+            list.prepend(item);
+        }
+    },
+
+    render_result(result) {
+        for (const [name, value] of Object.entries(result.totals)) {
+            const cell = this.el.querySelector(`.o_${name}`);
+            if (cell) {
+                cell.textContent = value;
+            }
+        }
+        const labels = {
+            ok: _t("Recorded"),
+            duplicate: _t("Already scanned"),
+            unknown: _t("Not on this trip"),
+            invalid: _t("Invalid scan"),
+            invalid_time: _t("Not on the trip date"),
+        };
+        const list = this.el.querySelector('.o_scanner_results');
+        for (const scan of result.results) {
+            const item = document.createElement('li');
+            item.className = `list-group-item ${scan.status === 'ok' ? 'list-group-item-success' : 'list-group-item-warning'}`;
+            item.textContent = `${scan.student || ''} ${labels[scan.status] || scan.status}`.trim();
+            list.prepend(item);
+        }
+    },
+});
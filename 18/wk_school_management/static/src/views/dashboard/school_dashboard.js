@@ -12,7 +12,7 @@ export class SchoolDashboard extends Component {
 		this.rpc = rpc;
 		this.action = useService('action');
 		this.keepLast = new KeepLast();
-		this.state = useState({})
+		this.state = useState({scheduled_classes: {rows: [], total: 0}})
 		var student = []
 		var teacher = []
 		var is_admin = true;
@@ -102,17 +102,31 @@ export class SchoolDashboard extends Component {
 	}
 
 	async load_scheduled_classes(){
+		await this.fetch_scheduled_classes(0);
+	}
+
+	async load_more_scheduled_classes(){
+		await this.fetch_scheduled_classes(this.state.scheduled_classes.rows.length);
+	}
+
+	async fetch_scheduled_classes(offset){
 		var selected_val = document.querySelector('#s_classes option:checked');
 		var selected_date = document.querySelector('#date_selection option:checked');
 		if (selected_val != null){
-			await rpc("/school_management/scheduled_classes", {'company_id':cookie.get('cids'),'sort_by':selected_val.value,'sort_date':selected_date.value}).then(function(result){
-				const scheduled_classes = document.getElementById('scheduled_classes_table');
-				if (scheduled_classes) {
-					scheduled_classes.innerHTML = result
-				}
-			})
+			const result = await rpc("/school_management/scheduled_classes", {'company_id':cookie.get('cids'),'sort_by':selected_val.value,'sort_date':selected_date.value,'offset':offset,'limit':20});
+			const rows = offset ? [...this.state.scheduled_classes.rows, ...result.rows] : result.rows;
+			this.state.scheduled_classes = {rows: rows, total: result.total};
 		}
 	}
+
+	openScheduledClass(class_id){
+		this.action.doAction({
+			type: 'ir.actions.act_window',
+			res_model: 'wk.class.timetable',
+			res_id: class_id,
+			views: [[false, 'form']],
+		});
+	}
 		
 	async fetch_data() {
 		const schoolDashboardData = await this.keepLast.add(
@@ -229,7 +243,7 @@ export class SchoolDashboard extends Component {
 			return;
 		}
 		this.rpc("/school_dashboard/enrollment_data", {'company_id':cookie.get('cids'),'sort_date':selected_date.value}).then((result) => {
-			var data = result;
+			var data = result.counts;
 			const enrollmentChartContainer = document.querySelector('#enrollment_card .p-3');
 			enrollmentChartContainer.innerHTML = '';
 			const isEmpty = !data || data.length === 0 || data.every(val => val === 0);
@@ -360,7 +374,7 @@ export class SchoolDashboard extends Component {
 			return;
 		}
 		this.rpc("/school_dashboard/application_data", {'company_id':cookie.get('cids'),'sort_date':selected_date.value}).then(function(result){
-			var data = result;
+			var data = result.counts;
 			const applicationPieChartContainer = document.querySelector('#application_card .p-3');
 			applicationPieChartContainer.innerHTML = '';
 			const isEmpty = !data || data.length === 0 || data.every(val => val === 0);
@@ -11,6 +11,8 @@ from . import cancel_reason
 from . import enroll_wizard
 from . import assignment_wizard
 from . import timetable_wizard
+from . import timetable_generator
+from . import timetable_reschedule
 from . import evaluation_wizard
 from . import res_config_settings
 from . import attendance_wizard
@@ -18,3 +20,4 @@ from . import portal_wizard
 from . import payment_link_wizard
 from . import fee_slip_wizard
 from . import student_route_wizard
+from . import route_optimizer_wizard
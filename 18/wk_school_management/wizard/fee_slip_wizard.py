@@ -8,7 +8,7 @@
 #################################################################################
 import logging
 import math
-from odoo import models, fields, _
+from odoo import models, fields, api, _, Command
 from odoo.exceptions import UserError
 from dateutil.relativedelta import relativedelta
 
@@ -31,6 +31,8 @@ class FeeSlipGenerateWizard(models.TransientModel):
         ], string='Payment Term', required=True)
     enrollment_id = fields.Many2one('student.enrollment', 'Enrollment')
     student_id = fields.Many2one(related='enrollment_id.student_id')
+    plan_line_ids = fields.One2many('wk.fee.generate.wizard.line', 'wizard_id', string="Installment Plan",
+                                    compute='_compute_plan_line_ids', store=True)
 
     @staticmethod
     def get_total_periods(payment_term, installment=None, start_date=None, end_date=None):
@@ -46,8 +48,14 @@ class FeeSlipGenerateWizard(models.TransientModel):
         else:
             return 1
         
-    def prepare_fee_slip(self, is_first_slip, current_period=1, one_time_fees=None, recurring_fees=None):
-        """Prepare values for a fee slip based on payment term, period, and fee summary."""
+    @staticmethod
+    def split_installments(total, installment_count):
+        """Split a recurring fee in installments, the last one absorbing the rounding."""
+        ceil_fees = [math.ceil(total / installment_count)] * (installment_count - 1)
+        return ceil_fees + [total - sum(ceil_fees)]
+
+    def get_period_dates(self, current_period=1):
+        """Return the date range of the given period of the payment term."""
         self.ensure_one()
         date_from = date_to = False
 
@@ -65,78 +73,93 @@ class FeeSlipGenerateWizard(models.TransientModel):
             days_per_installment = total_days // self.installment
             date_from = self.start_date + relativedelta(days=(current_period - 1) * days_per_installment)
             date_to = self.end_date if current_period == self.installment else date_from + relativedelta(days=days_per_installment - 1)
+        return date_from, date_to
 
-        slip_vals = {
-            'enrollment_id': self.enrollment_id.id,
-            'fee_slip_line_ids': [],
-            'date_from': date_from,
-            'date_to': date_to,
-        }
-
-        if one_time_fees:
-            for summary in one_time_fees:
-                slip_vals['fee_slip_line_ids'].append((0, 0, {
-                    'product_id': summary.product_id.id,
-                    'fee': math.ceil(summary.fee)
-                }))
-
-        if recurring_fees:
-            installment_count = self.get_total_periods(
-                self.payment_term, self.installment, self.start_date, self.end_date)
-            for summary in recurring_fees:
-                total = summary.fee
-                raw = total / installment_count
-                ceil_fees = [math.ceil(raw)] * (installment_count - 1)
-                last_fee = total - sum(ceil_fees)
-                all_installments = ceil_fees + [last_fee]
-                current_fee = all_installments[current_period - 1]
-                slip_vals['fee_slip_line_ids'].append((0, 0, {
-                    'product_id': summary.product_id.id,
-                    'fee': current_fee
-                }))        
-        return slip_vals
-
-    def generate_now(self):
-        if self.enrollment_id.generated_amount == self.enrollment_id.total_amount:
-            return
+    def get_installment_plan(self):
+        """Return the values of every fee slip still to be generated for the enrollment.
 
+        The installments of each recurring fee are split once, so the whole
+        schedule is computed in a single pass over the periods.
+        """
+        self.ensure_one()
+        enrollment = self.enrollment_id
         total_periods = self.get_total_periods(
             self.payment_term, self.installment, self.start_date, self.end_date)
-        paid_slips = self.enrollment_id.fee_slip_ids.filtered(lambda s: s.state == 'paid')
-        unpaid_slips = self.enrollment_id.fee_slip_ids.filtered(lambda s: s.state != 'paid')
+        paid_slips = enrollment.fee_slip_ids.filtered(lambda s: s.state == 'paid')
+        unpaid_slips = enrollment.fee_slip_ids - paid_slips
         paid_one_time_product_ids = set(paid_slips.mapped('fee_slip_line_ids.product_id.id'))
 
-        one_time_fees = self.enrollment_id.fee_summary_ids.filtered(lambda s: s.frequency == 'one')
+        one_time_fees = enrollment.fee_summary_ids.filtered(lambda s: s.frequency == 'one')
         new_one_time_fees = one_time_fees.filtered(lambda s: s.product_id.id not in paid_one_time_product_ids)
+        recurring_fees = enrollment.fee_summary_ids.filtered(lambda s: s.frequency == 'multi')
 
-        unpaid_slips.unlink()
         paid_count = len(paid_slips)
-        slips_to_generate = total_periods - paid_count
-        recurring_fees = self.enrollment_id.fee_summary_ids.filtered(lambda s: s.frequency == 'multi')
-
-        if slips_to_generate > 0:
-            for period in range(paid_count + 1, total_periods + 1):
-                is_first_new = (period == paid_count + 1)
-                slip_vals = self.prepare_fee_slip(
-                    is_first_slip=is_first_new,
-                    current_period=period,
-                    one_time_fees=new_one_time_fees if is_first_new else None,
-                    recurring_fees=recurring_fees
-                )
-                if slip_vals['fee_slip_line_ids']:
-                    self.env['wk.fee.slip'].create(slip_vals)
-
+        if total_periods - paid_count > 0:
+            periods = range(paid_count + 1, total_periods + 1)
         elif not unpaid_slips and new_one_time_fees:
-            slip_vals = self.prepare_fee_slip(
-                is_first_slip=False,
-                current_period=paid_count + 1,
-                one_time_fees=new_one_time_fees,
-                recurring_fees=None
-            )
-            if slip_vals['fee_slip_line_ids']:
-                self.env['wk.fee.slip'].create(slip_vals)
+            periods = [paid_count + 1]
+            recurring_fees = recurring_fees.browse()
+        else:
+            return []
+
+        installments = [
+            (summary.product_id.id, self.split_installments(summary.fee, total_periods))
+            for summary in recurring_fees
+        ]
+        plan = []
+        for period in periods:
+            date_from, date_to = self.get_period_dates(period)
+            slip_lines = []
+            if period == periods[0]:
+                slip_lines += [(0, 0, {
+                    'product_id': summary.product_id.id,
+                    'fee': math.ceil(summary.fee)
+                }) for summary in new_one_time_fees]
+            slip_lines += [(0, 0, {
+                'product_id': product_id,
+                'fee': amounts[period - 1]
+            }) for product_id, amounts in installments]
+            if slip_lines:
+                plan.append({
+                    'enrollment_id': enrollment.id,
+                    'fee_slip_line_ids': slip_lines,
+                    'date_from': date_from,
+                    'date_to': date_to,
+                })
+        return plan
+
+    @api.depends('enrollment_id', 'payment_term', 'installment', 'start_date', 'end_date')
+    def _compute_plan_line_ids(self):
+        for wizard in self:
+            plan = []
+            if wizard.enrollment_id and wizard.start_date and wizard.end_date and wizard.payment_term:
+                plan = wizard.get_installment_plan()
+            wizard.plan_line_ids = [Command.clear()] + [Command.create({
+                'date_from': slip_vals['date_from'],
+                'date_to': slip_vals['date_to'],
+                'amount': sum(line[2]['fee'] for line in slip_vals['fee_slip_line_ids']),
+            }) for slip_vals in plan]
+
+    def generate_now(self):
+        if self.enrollment_id.generated_amount == self.enrollment_id.total_amount:
+            return
+
+        plan = self.get_installment_plan()
+        self.enrollment_id.fee_slip_ids.filtered(lambda s: s.state != 'paid').unlink()
+        if plan:
+            self.env['wk.fee.slip'].create(plan)
 
         self.enrollment_id.generated_amount = sum(self.enrollment_id.fee_slip_ids.mapped('total_amount'))
         self.enrollment_id.payment_term = self.payment_term
         self.enrollment_id.installment = self.installment
-    
+
+
+class FeeSlipGenerateWizardLine(models.TransientModel):
+    _name = 'wk.fee.generate.wizard.line'
+    _description = 'Fee Slip Generation Preview Line'
+    _order = 'date_from'
+
+    wizard_id = fields.Many2one('wk.fee.generate.wizard', string="Wizard", ondelete='cascade')
+    date_from = fields.Date(string="Date From")
+    date_to = fields.Date(string="Date To")
+    amount = fields.Float(string="Amount", digits='Product Price')
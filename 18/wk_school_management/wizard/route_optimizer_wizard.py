@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+#################################################################################
+#
+# Copyright (c) 2016-Present Webkul Software Pvt. Ltd. (<https://webkul.com/>; )
+# See LICENSE file for full copyright and licensing details.
+# License URL : <https://store.webkul.com/license.html/>;
+#
+#################################################################################
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from collections import defaultdict
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class RouteOptimizerWizard(models.TransientModel):
+
+    _name = 'transport.route.optimizer'
+    _description = 'Transport Route Optimizer'
+
+    route_ids = fields.Many2many('transport.route', string='Routes', domain="[('state', '!=', 'inactive')]")
+    optimize_stops = fields.Boolean(string='Reorder Stops', default=True,
+                                    help="Reorder the stops of the routes and estimate their pickup and dropoff times.")
+    suggest_split = fields.Boolean(string='Suggest Capacity Split', default=True,
+                                   help="Suggest moving students of the routes over their capacity to the nearest routes with free seats.")
+    line_ids = fields.One2many('transport.route.optimizer.line', 'wizard_id', string='Suggested Moves')
+    is_optimized = fields.Boolean(string='Optimized')
+
+    @api.model
+    def default_get(self, fields_list):
+        res = super().default_get(fields_list)
+        if self._context.get('active_model') == 'transport.route' and self._context.get('active_ids'):
+            res['route_ids'] = [(6, 0, self._context['active_ids'])]
+        return res
+
+    def _message_action(self, message):
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Routes Optimized'),
+            'res_model': 'wk.message.wizard',
+            'views': [(self.env.ref('wk_school_management.wk_message_wizard_view_form_success').id, 'form')],
+            'target': 'new',
+            'context': {
+                'default_message': message
+            }
+        }
+
+    def action_optimize(self):
+        self.ensure_one()
+        routes = self.route_ids or self.env['transport.route'].search([('state', '=', 'active')])
+        if not routes:
+            raise UserError(_("There is no route to optimize."))
+        if self.optimize_stops:
+            routes.action_optimize_stops()
+        moves = routes._get_capacity_split_suggestions() if self.suggest_split else []
+        if not moves:
+            return self._message_action(_("%s route(s) have been optimized.", len(routes)))
+        self.write({
+            'route_ids': [(6, 0, routes.ids)],
+            'line_ids': [(5, 0, 0)] + [(0, 0, move) for move in moves],
+            'is_optimized': True,
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Suggested Moves'),
+            'res_model': self._name,
+            'res_id': self.id,
+            'views': [(False, 'form')],
+            'target': 'new',
+        }
+
+    def action_apply_split(self):
+        self.ensure_one()
+        if not self.line_ids:
+            raise UserError(_("There is no move to apply."))
+        moves = defaultdict(lambda: self.env['student.student'])
+        arrivals = defaultdict(lambda: self.env['student.student'])
+        for line in self.line_ids:
+            moves[line.to_route_id, line.location_id] |= line.student_id
+            arrivals[line.to_route_id] |= line.student_id
+        # The net change of every route is checked before any write, so that a swap
+        # between two full routes is accepted; the routes are locked in id order.
+        leaving = self.line_ids.student_id
+        for route in sorted(arrivals, key=lambda route: route.id):
+            route._reserve_capacity(arrivals[route], leaving=leaving)
+        for (route, location), students in moves.items():
+            students.write({'route_id': route.id, 'location_id': location.id})
+        return self._message_action(_("%s student(s) have been moved to another route.", len(self.line_ids)))
+
+
+class RouteOptimizerWizardLine(models.TransientModel):
+
+    _name = 'transport.route.optimizer.line'
+    _description = 'Transport Route Optimizer Suggested Move'
+    _order = 'from_route_id, distance'
+
+    wizard_id = fields.Many2one('transport.route.optimizer', string='Wizard', ondelete='cascade')
+    student_id = fields.Many2one('student.student', string='Student', required=True)
+    from_route_id = fields.Many2one('transport.route', string='Current Route')
+    to_route_id = fields.Many2one('transport.route', string='Suggested Route', required=True)
+    location_id = fields.Many2one('transport.location', string='Suggested Stop', required=True)
+    distance = fields.Float(string='Distance (km)', digits=(16, 2),
+                            help="Distance between the current stop of the student and the suggested one.")
@@ -21,16 +21,14 @@ class StudentRouteWizard(models.TransientModel):
     route_stop_ids = fields.Many2many('transport.route.stop', string='Route Stops', help="Select stops for the transport route")
     location_id = fields.Many2one('transport.location', string='Location', help='select location for the student')
     available_routes = fields.Many2many('transport.route', string='Available Transport Route')
+    placement_ids = fields.One2many('student.route.placement', 'wizard_id', string='Placements')
 
     def action_assign_route(self):
         if not self.student_ids or not self.route_id:
             raise UserError(_("Please select at least one student and a transport route."))
         
-        if self.route_id.remaining_capacity < len(self.student_ids):
-            raise UserError(_("The number of selected students exceeds the available capacity of the route. Please reduce the number of students."))
-        
-        for student in self.student_ids:
-            student.write({'route_id': self.route_id.id})
+        newcomers = self.route_id._reserve_capacity(self.student_ids)
+        newcomers.write({'route_id': self.route_id.id})
         
         return {'type': 'ir.actions.act_window_close'}
     
@@ -85,18 +83,11 @@ class StudentRouteWizard(models.TransientModel):
         
         if not students:
             raise UserError(_("No student found to assign the route."))
-        else:
-            for student in students:
-                if student.route_id:
-                    student.route_id = False
-                    
-                if self.route_id.remaining_capacity > 0:
-                    student.write({'route_id': self.route_id.id,
-                                'location_id': self.location_id.id,
-                                'is_transport_enabled': True,
-                                })
-                else:
-                    raise UserError(_("No room left in this Route please choose another Route"))
+        self.route_id._reserve_capacity(students)
+        students.write({'route_id': self.route_id.id,
+                        'location_id': self.location_id.id,
+                        'is_transport_enabled': True,
+                        })
         
         return {'type': 'ir.actions.act_window_close'}
     
@@ -106,14 +97,11 @@ class StudentRouteWizard(models.TransientModel):
         
         if not students:
             raise UserError(_("No student found to assign the route."))
-        elif self.route_id.remaining_capacity < len(students):
-            raise UserError(_("The number of selected students exceeds the available capacity for the chosen route. Please select a different route or reduce the number of students."))
-        else:
-            for student in students:
-                student.write({'route_id': self.route_id.id,
-                                'location_id': self.location_id.id,
-                                'is_transport_enabled': True,
-                                })
+        self.route_id._reserve_capacity(students)
+        students.write({'route_id': self.route_id.id,
+                        'location_id': self.location_id.id,
+                        'is_transport_enabled': True,
+                        })
     
         message = _(
             "Transportation services for students have been successfully activated."
@@ -127,4 +115,37 @@ class StudentRouteWizard(models.TransientModel):
             'context': {
                 'default_message': message
             }
-        }
\ No newline at end of file
+        }
+
+    def action_auto_assign(self):
+        self.ensure_one()
+        students = self.student_ids or self.env['student.student'].browse(self._context.get('active_ids'))
+        if not students:
+            raise UserError(_("No student found to assign the route."))
+        report = self.env['transport.route'].assign_students_by_location(students, self.location_id)
+        self.placement_ids = [(5, 0, 0)] + [(0, 0, placement) for placement in report]
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Route Placements'),
+            'res_model': self._name,
+            'res_id': self.id,
+            'views': [(self.env.ref('wk_school_management.student_route_wizard_view_form_auto_assign').id, 'form')],
+            'target': 'new',
+        }
+
+
+class StudentRoutePlacement(models.TransientModel):
+    _name = 'student.route.placement'
+    _description = 'Student Transport Route Placement'
+
+    wizard_id = fields.Many2one('student.route.wizard', string='Wizard', ondelete='cascade')
+    student_id = fields.Many2one('student.student', string='Student')
+    location_id = fields.Many2one('transport.location', string='Location')
+    route_id = fields.Many2one('transport.route', string='Route')
+    status = fields.Selection([
+        ('assigned', 'Assigned'),
+        ('already_assigned', 'Already Assigned'),
+        ('no_location', 'No Location'),
+        ('no_route', 'No Route at Location'),
+        ('no_capacity', 'Routes Full'),
+    ], string='Status')
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+#################################################################################
+#
+# Copyright (c) 2016-Present Webkul Software Pvt. Ltd. (<https://webkul.com/>; )
+# See LICENSE file for full copyright and licensing details.
+# License URL : <https://store.webkul.com/license.html/>;
+#
+#################################################################################
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from collections import defaultdict
+import random
+import time
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class TimetableSolver:
+    """Weekly timetable search over (day, period, location) placements.
+
+    Every lesson is one weekly period of a class. Lessons are placed greedily,
+    most constrained first; when a lesson has no free placement, the placement
+    with the fewest clashes is taken and the clashing lessons are put back in
+    the queue (iterative forward search), until everything is placed or the
+    time limit is reached. Teachers, locations and sections may never be booked
+    twice on overlapping periods, and a class is spread over the week.
+    """
+
+    def __init__(self, days, slots, lessons, fixed=None, time_limit=30, seed=None, placeable=None):
+        # slots: [(slot_id, start, end)], lessons are only placed on the first `placeable` ones
+        # lessons / fixed: [{'class_id', 'teachers', 'grade', 'section', 'rooms'}]
+        self.days = days
+        self.slots = slots
+        self.placeable = len(slots) if placeable is None else placeable
+        self.lessons = lessons
+        self.time_limit = time_limit
+        self.random = random.Random(seed)
+        self.overlaps = [
+            [index for index, other in enumerate(slots) if other[1] < slot[2] and slot[1] < other[2]]
+            for slot in slots
+        ]
+        self.placement = {}
+        self.placed_at = defaultdict(list)
+        self.class_days = defaultdict(int)
+        self.day_load = defaultdict(int)
+        self.fixed = []
+        for lesson in fixed or []:
+            self.fixed.append(lesson)
+            self.placed_at[(lesson['day'], lesson['slot'])].append(('fixed', len(self.fixed) - 1))
+
+    def _lesson(self, key):
+        return self.fixed[key[1]] if key[0] == 'fixed' else self.lessons[key[1]]
+
+    def _room(self, key):
+        return self.fixed[key[1]]['room'] if key[0] == 'fixed' else self.placement[key[1]][2]
+
+    @staticmethod
+    def _clash(lesson, other):
+        if lesson['teachers'] & other['teachers']:
+            return True
+        return lesson['grade'] == other['grade'] and (
+            lesson['section'] == other['section'] or not lesson['section'] or not other['section'])
+
+    def _conflicts(self, index, day, slot, room):
+        """Return the lessons clashing with the placement, or None if a fixed one does."""
+        lesson = self.lessons[index]
+        conflicts = set()
+        for other_slot in self.overlaps[slot]:
+            for key in self.placed_at[(day, other_slot)]:
+                if key == ('lesson', index):
+                    continue
+                if self._room(key) == room or self._clash(lesson, self._lesson(key)):
+                    if key[0] == 'fixed':
+                        return None
+                    conflicts.add(key[1])
+        return conflicts
+
+    def _place(self, index, day, slot, room):
+        self.placement[index] = (day, slot, room)
+        self.placed_at[(day, slot)].append(('lesson', index))
+        self.class_days[(self.lessons[index]['class_id'], day)] += 1
+        self.day_load[day] += 1
+
+    def _unplace(self, index):
+        day, slot, room = self.placement.pop(index)
+        self.placed_at[(day, slot)].remove(('lesson', index))
+        self.class_days[(self.lessons[index]['class_id'], day)] -= 1
+        self.day_load[day] -= 1
+
+    def solve(self):
+        """Return ({lesson index: (day, slot index, room)}, [unplaced lesson indexes])."""
+        queue = sorted(range(len(self.lessons)), key=lambda index: (
+            len(self.lessons[index]['rooms']), -len(self.lessons[index]['teachers'])))
+        kicked = defaultdict(int)
+        deadline = time.time() + self.time_limit
+        while queue and time.time() < deadline:
+            index = queue.pop(0)
+            lesson = self.lessons[index]
+            best, best_score = None, None
+            for day in self.days:
+                for slot in range(self.placeable):
+                    for room in lesson['rooms']:
+                        conflicts = self._conflicts(index, day, slot, room)
+                        if conflicts is None:
+                            continue
+                        score = (
+                            sum(kicked[other] + 1 for other in conflicts),
+                            self.class_days[(lesson['class_id'], day)],
+                            self.day_load[day],
+                            self.random.random(),
+                        )
+                        if best_score is None or score < best_score:
+                            best, best_score = (day, slot, room, conflicts), score
+            if not best:
+                continue
+            day, slot, room, conflicts = best
+            for other in conflicts:
+                self._unplace(other)
+                kicked[other] += 1
+                queue.append(other)
+            self._place(index, day, slot, room)
+        unplaced = [index for index in range(len(self.lessons)) if index not in self.placement]
+        return dict(self.placement), unplaced
+
+
+class TimetableGeneratorWizard(models.TransientModel):
+
+    _name = 'wk.timetable.generator'
+    _description = 'School-wide Timetable Generator'
+
+    session_id = fields.Many2one('wk.school.session', string='Session', required=True)
+    term_id = fields.Many2one('wk.grade.terms', string='Term',
+                              domain="[('academic_year_id.session_id', '=', session_id)]")
+    class_ids = fields.Many2many('wk.school.class', string='Classes',
+                                 compute='_compute_class_ids', store=True, readonly=False,
+                                 domain="[('session_id', '=', session_id), ('state', '!=', 'complete')]")
+    timeslot_ids = fields.Many2many('wk.class.timeslot', string='Periods',
+                                    default=lambda self: self.env['wk.class.timeslot'].search([]))
+    location_ids = fields.Many2many('wk.class.location', string='Locations',
+                                    default=lambda self: self.env['wk.class.location'].search([]))
+    working_days = fields.Selection([
+        ('5', 'Monday to Friday'),
+        ('6', 'Monday to Saturday'),
+        ('7', 'All Week'),
+    ], string='Working Days', default='5', required=True)
+    time_limit = fields.Integer(string='Time Limit (seconds)', default=30)
+
+    @api.depends('session_id', 'term_id')
+    def _compute_class_ids(self):
+        for wizard in self:
+            domain = [('session_id', '=', wizard.session_id.id), ('state', '!=', 'complete'),
+                      ('weekly_periods', '>', 0)]
+            if wizard.term_id:
+                domain.append(('term_id', '=', wizard.term_id.id))
+            wizard.class_ids = self.env['wk.school.class'].search(domain) if wizard.session_id else False
+
+    def _prepare_lesson(self, populate_class, rooms):
+        return {
+            'class_id': populate_class.id,
+            'teachers': frozenset((populate_class.teacher_id | populate_class.teacher_ids).ids),
+            'grade': populate_class.grade_id.id,
+            'section': populate_class.section_id.id,
+            'rooms': rooms,
+        }
+
+    def generate_timetable(self):
+        self.ensure_one()
+        if not self.class_ids:
+            raise UserError(_("There is no class with weekly periods to schedule."))
+        if not self.timeslot_ids or not self.location_ids:
+            raise UserError(_("Please select the periods and locations to use."))
+
+        days = [day for day, _label in self.env['wk.weekly.schedule'].DAYS][:int(self.working_days)]
+        timeslots = self.timeslot_ids.sorted('start_time')
+
+        # The periods not yet scheduled are replaced, the scheduled ones are kept as fixed,
+        # as well as every schedule booking one of the teachers or locations, whatever its
+        # session, so that the result passes the overlap check of the weekly schedules.
+        replaced = self.class_ids.weekly_schedule_ids.filtered(lambda s: s.state == 'new')
+        teachers = self.class_ids.teacher_id | self.class_ids.teacher_ids
+        fixed_schedules = self.env['wk.weekly.schedule'].sudo().search([
+            ('id', 'not in', replaced.ids),
+            ('weekday', 'in', days),
+            ('timeslot_id', '!=', False),
+            '|', ('populate_class_id', '=', False), ('populate_class_id.state', '!=', 'complete'),
+            '|', '|', '|',
+            ('populate_class_id.session_id', '=', self.session_id.id),
+            ('location_id', 'in', self.location_ids.ids),
+            ('populate_class_id.teacher_id', 'in', teachers.ids),
+            ('populate_class_id.teacher_ids', 'in', teachers.ids),
+        ]).filtered(lambda s: any(
+            s.timeslot_id.start_time < slot.end_time and slot.start_time < s.timeslot_id.end_time
+            for slot in timeslots))
+        # The timeslots of the fixed schedules not selected only come after the placeable ones.
+        extra_timeslots = (fixed_schedules.timeslot_id - timeslots).sorted('start_time')
+        slots = [(slot.id, slot.start_time, slot.end_time) for slot in timeslots | extra_timeslots]
+        slot_index = {slot[0]: index for index, slot in enumerate(slots)}
+        fixed = []
+        for schedule in fixed_schedules:
+            fixed_lesson = self._prepare_lesson(schedule.populate_class_id, [])
+            if schedule.populate_class_id.session_id != self.session_id:
+                # another session only shares its teachers and locations
+                fixed_lesson['grade'] = False
+            fixed_lesson.update(day=schedule.weekday, slot=slot_index[schedule.timeslot_id.id],
+                                room=schedule.location_id.id)
+            fixed.append(fixed_lesson)
+
+        scheduled_count = defaultdict(int)
+        for schedule in self.class_ids.weekly_schedule_ids - replaced:
+            scheduled_count[schedule.populate_class_id.id] += 1
+        lessons = []
+        for populate_class in self.class_ids:
+            rooms = (populate_class.location_ids & self.location_ids or self.location_ids).ids
+            lesson = self._prepare_lesson(populate_class, rooms)
+            lessons += [lesson] * max(populate_class.weekly_periods - scheduled_count[populate_class.id], 0)
+
+        solver = TimetableSolver(days, slots, lessons, fixed=fixed, time_limit=self.time_limit,
+                                 placeable=len(timeslots))
+        placement, unplaced = solver.solve()
+        if lessons and not placement:
+            raise UserError(_("No period could be scheduled without clash, the current timetable is kept."))
+        replaced.unlink()
+        self.env['wk.weekly.schedule'].create([{
+            'populate_class_id': lessons[index]['class_id'],
+            'weekday': day,
+            'timeslot_id': slots[slot][0],
+            'location_id': room,
+        } for index, (day, slot, room) in placement.items()])
+
+        if unplaced:
+            unplaced_classes = self.env['wk.school.class'].browse({lessons[index]['class_id'] for index in unplaced})
+            message = _("%(placed)s periods have been scheduled, %(unplaced)s could not be placed without clash for: %(classes)s",
+                        placed=len(placement), unplaced=len(unplaced),
+                        classes=", ".join(unplaced_classes.mapped('name')))
+        else:
+            message = _("%s periods have been scheduled without any clash.", len(placement))
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Timetable Generated'),
+            'res_model': 'wk.message.wizard',
+            'views': [(self.env.ref('wk_school_management.wk_message_wizard_view_form_success').id, 'form')],
+            'target': 'new',
+            'context': {
+                'default_message': message
+            }
+        }
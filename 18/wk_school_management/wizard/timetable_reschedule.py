@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#################################################################################
+#
+# Copyright (c) 2016-Present Webkul Software Pvt. Ltd. (<https://webkul.com/>; )
+# See LICENSE file for full copyright and licensing details.
+# License URL : <https://store.webkul.com/license.html/>;
+#
+#################################################################################
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class TimetableRescheduleWizard(models.TransientModel):
+
+    _name = 'wk.timetable.reschedule'
+    _description = 'Bulk Class Rescheduling'
+
+    operation = fields.Selection([
+        ('shift', 'Postpone / Advance'),
+        ('move', 'Change Location / Teacher'),
+        ('cancel', 'Cancel'),
+    ], string='Operation', default='shift', required=True)
+    date_from = fields.Date(string='From')
+    date_to = fields.Date(string='To')
+    teacher_id = fields.Many2one('hr.employee', string='Teacher', domain="[('is_teacher','=',True)]")
+    location_id = fields.Many2one('wk.class.location', string='Location')
+    populate_class_id = fields.Many2one('wk.school.class', string='Class')
+    timetable_ids = fields.Many2many('wk.class.timetable', string='Classes',
+                                     compute='_compute_timetable_ids', store=True, readonly=False)
+    shift_days = fields.Integer(string='Shift (days)', default=7,
+                                help="Number of days the classes are moved by, negative to advance them.")
+    new_location_id = fields.Many2one('wk.class.location', string='New Location')
+    new_teacher_id = fields.Many2one('hr.employee', string='New Teacher', domain="[('is_teacher','=',True)]")
+    reason = fields.Text(string='Reason')
+
+    @api.model
+    def default_get(self, fields_list):
+        res = super().default_get(fields_list)
+        if self._context.get('active_model') == 'wk.class.timetable' and self._context.get('active_ids'):
+            res['timetable_ids'] = [(6, 0, self._context['active_ids'])]
+        return res
+
+    @api.depends('date_from', 'date_to', 'teacher_id', 'location_id', 'populate_class_id')
+    def _compute_timetable_ids(self):
+        for wizard in self:
+            if not (wizard.date_from or wizard.date_to or wizard.teacher_id
+                    or wizard.location_id or wizard.populate_class_id):
+                continue
+            domain = [('state', '=', 'draft')]
+            if wizard.date_from:
+                domain.append(('class_date', '>=', wizard.date_from))
+            if wizard.date_to:
+                domain.append(('class_date', '<=', wizard.date_to))
+            if wizard.teacher_id:
+                domain.append(('teacher_id', '=', wizard.teacher_id.id))
+            if wizard.location_id:
+                domain.append(('location_id', '=', wizard.location_id.id))
+            if wizard.populate_class_id:
+                domain.append(('populate_class_id', '=', wizard.populate_class_id.id))
+            wizard.timetable_ids = self.env['wk.class.timetable'].search(domain)
+
+    def action_apply(self):
+        self.ensure_one()
+        if not self.timetable_ids:
+            raise UserError(_("There is no class to reschedule."))
+        count = self.timetable_ids.reschedule_classes(
+            shift_days=self.shift_days if self.operation == 'shift' else 0,
+            cancel=self.operation == 'cancel',
+            location_id=self.operation == 'move' and self.new_location_id.id,
+            teacher_id=self.operation == 'move' and self.new_teacher_id.id,
+            reason=self.reason,
+        )
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Classes Rescheduled'),
+            'res_model': 'wk.message.wizard',
+            'views': [(self.env.ref('wk_school_management.wk_message_wizard_view_form_success').id, 'form')],
+            'target': 'new',
+            'context': {
+                'default_message': _("%s class(es) have been updated.", count)
+            }
+        }